@@ -0,0 +1,19 @@
+"""
+Settings for the commands run before the app serves requests.
+
+Usage: python manage.py migrate --settings=app.minimal_settings
+
+Only the apps owning models are installed and the URLconf is empty, so
+the system checks don't import the API views, DRF or the signal
+handlers of the recipe app.
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import INSTALLED_APPS
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in ('django.contrib.staticfiles', 'rest_framework', 'user',
+                   'recipe')
+]
+
+ROOT_URLCONF = 'app.minimal_urls'
@@ -0,0 +1,3 @@
+"""Empty URLconf of app.minimal_settings"""
+
+urlpatterns = []
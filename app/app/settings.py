@@ -27,6 +27,8 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+INTERNAL_IPS = os.environ.get('INTERNAL_IPS', '127.0.0.1').split(',')
+
 
 # Application definition
 
@@ -45,6 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.LoadSheddingMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +96,24 @@ DATABASES = {
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/2.1/topics/auth/passwords/
+# The first hasher is used for new passwords, the stored hashes of the
+# others are upgraded on login. To switch to Argon2, install argon2-cffi and
+# put django.contrib.auth.hashers.Argon2PasswordHasher first in the
+# comma separated PASSWORD_HASHERS variable.
+
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'core.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher'
+).split(',')
+
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 120000)
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -132,4 +156,151 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# core.storage.ContentAddressedStorage keeps the files under MEDIA_ROOT,
+# core.storage.ObjectStorage in the S3 compatible store of OBJECT_STORAGE
+DEFAULT_FILE_STORAGE = os.environ.get(
+    'FILE_STORAGE', 'core.storage.ContentAddressedStorage'
+)
+FILE_UPLOAD_PERMISSIONS = 0o644
+
+OBJECT_STORAGE = {
+    'CLIENT': os.environ.get(
+        'OBJECT_STORAGE_CLIENT', 'core.object_store.S3Client'
+    ),
+    'ENDPOINT_URL': os.environ.get(
+        'OBJECT_STORAGE_ENDPOINT_URL', 'https://s3.amazonaws.com'
+    ),
+    'BUCKET': os.environ.get('OBJECT_STORAGE_BUCKET', 'recipe-media'),
+    'ACCESS_KEY': os.environ.get('OBJECT_STORAGE_ACCESS_KEY', ''),
+    'SECRET_KEY': os.environ.get('OBJECT_STORAGE_SECRET_KEY', ''),
+    'REGION': os.environ.get('OBJECT_STORAGE_REGION', 'us-east-1'),
+    'ADDRESSING_STYLE': 'path',
+    'URL_EXPIRES': 900,
+}
+
+# Media is only served to its owner. Set MEDIA_ACCEL_REDIRECT to
+# 'x-accel-redirect' (nginx, internal location at MEDIA_ACCEL_PREFIX) or
+# 'x-sendfile' (Apache, lighttpd) to let the front proxy send the files.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_OWNER_CACHE_TIMEOUT = 300
+
 AUTH_USER_MODEL = 'core.User'
+
+# Throttle buckets are kept in the default cache, in memory of each process
+# unless CACHES points to a shared cache such as memcached
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.EndpointRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'endpoint': os.environ.get('THROTTLE_ENDPOINT_RATE', '300/min'),
+        'login': '30/min',
+        'login_email': '5/min',
+    },
+}
+
+# Signed auth tokens, revocations are synced from the database into memory
+
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 7 * 24 * 3600))
+AUTH_REVOCATION_SYNC_INTERVAL = 10
+# Rows created this many seconds before the last sync are read again, for
+# the revocations committed late
+AUTH_REVOCATION_SYNC_OVERLAP = 60
+AUTH_REVOCATION_CAPACITY = 100000
+AUTH_REVOCATION_ERROR_RATE = 0.001
+# Keep accepting the tokens stored by rest_framework.authtoken
+AUTH_LEGACY_TOKENS = True
+
+
+# Request budgets, requests going over them are logged as warnings
+
+REQUEST_QUERY_BUDGET = int(os.environ.get('REQUEST_QUERY_BUDGET', 50))
+REQUEST_LATENCY_BUDGET_MS = int(
+    os.environ.get('REQUEST_LATENCY_BUDGET_MS', 500)
+)
+
+
+# Load shedding: each process answers 503 to the requests over a limit of
+# concurrent requests, lowered at most once per window while the requests of
+# the window, or their queries, are slower than tolerance times the usual
+# latency of their view
+LOAD_SHEDDING = True
+LOAD_SHEDDING_MIN_CONCURRENCY = 4
+LOAD_SHEDDING_MAX_CONCURRENCY = int(
+    os.environ.get('LOAD_SHEDDING_MAX_CONCURRENCY', 64)
+)
+LOAD_SHEDDING_WINDOW_MS = 1000
+LOAD_SHEDDING_TOLERANCE = 1.5
+LOAD_SHEDDING_RETRY_AFTER = 1
+LOAD_SHEDDING_EXEMPT_PATHS = ('/metrics/', '/admin/')
+
+
+# Sampling profiler, only the views listed here are ever sampled
+
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_VIEWS = ['RecipeViewSet', 'TagViewSet', 'IngredientViewSet']
+PROFILING_INTERVAL_MS = 5
+PROFILING_MAX_STACKS = 2000
+
+
+# Background jobs, run by `manage.py run_jobs`. The concurrency of a queue
+# is the number of its jobs running at once over all the workers.
+
+JOB_QUEUES = {
+    'default': {'concurrency': 4},
+    'images': {'concurrency': 2},
+}
+JOB_TIMEOUT = 600
+JOB_RETRY_DELAY = 10
+
+# Admin changelists show the Postgres estimate of their number of rows
+# instead of counting them when it is at least this many
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Deleted users and recipes are hidden at once and removed by
+# `manage.py purge_deleted` after the retention, in batches
+SOFT_DELETE_RETENTION_HOURS = 24
+PURGE_BATCH_SIZE = 1000
+
+# Most changes returned by one page of the sync endpoint
+SYNC_PAGE_SIZE = 500
+
+# Most recipes returned by /api/recipe/recipes/<id>/similar/
+SIMILAR_RECIPES_MAX = 50
+
+# Answer the tags and ingredients filters of the recipe list from an
+# in-memory index per user, holding at most this many ids per process
+RECIPE_FILTER_INDEX = True
+RECIPE_FILTER_INDEX_MAX_SIZE = 1000000
+
+# Facet counts are cached per user and filters until the user changes data
+RECIPE_FACETS_CACHE_TIMEOUT = 300
+
+# Concurrent identical reads of the tags, ingredients and recipes of a user
+# share one run of their queries, and reuse its result for this long. A
+# change is seen at once by the process making it, by the others after
+# the TTL at most. A request waits for a shared run no longer than the TTL
+# before running its own.
+COALESCE_READS = True
+COALESCE_READS_TTL_MS = 100
+
+# Responses of these types and at least this size are compressed, with
+# Brotli when the brotli package is installed and the client accepts it
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = ('application/json', 'text/')
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# The tag and ingredient lists and the recipe details are cached rendered
+# and compressed, per user until the user changes data
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Uploaded recipe images are shrunk in the background to fit this size
+RECIPE_IMAGE_MAX_SIZE = 2048
+RECIPE_IMPORT_MAX = 1000
+# Most recipes a batch update can change, in one transaction
+RECIPE_BATCH_MAX = 100
+
+# Most recipes, repeated ones included, a meal plan can be built from
+MEAL_PLAN_MAX_RECIPES = 100
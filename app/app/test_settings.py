@@ -0,0 +1,24 @@
+"""
+Settings for running the test suite without Postgres.
+
+Usage: python manage.py test --settings=app.test_settings
+
+The database is SQLite in memory, passwords are hashed with MD5 and the
+tests run in parallel processes unless --parallel is given explicitly.
+The test runner gives each run a temporary MEDIA_ROOT.
+"""
+from app.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# Hashing passwords with PBKDF2 dominates the time of the API tests
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+TEST_RUNNER = 'core.test_runner.ParallelDiscoverRunner'
@@ -15,11 +15,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+from recipe.views import RecipeImageView
+
 urlpatterns = [
+    path('admin/profile/', core_views.profile, name='profile'),
     path('admin/', admin.site.urls),
+    path('metrics/', core_views.metrics, name='metrics'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/jobs/<int:pk>/', core_views.JobDetailView.as_view(),
+         name='job-detail'),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>',
+         RecipeImageView.as_view(), name='media'),
+]
@@ -1,13 +1,65 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
 from core import models
 
 
+def estimate_count(queryset):
+    """Return the number of rows Postgres expects the queryset to have"""
+    with connections[queryset.db].cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            return int(cursor.fetchone()[0])
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the planner estimate for large changelists
+
+    The exact COUNT(*) is only run when fewer rows than
+    ADMIN_EXACT_COUNT_LIMIT are expected.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            estimate = estimate_count(queryset)
+            if estimate >= settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin for tables too large to count or list in a select"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+
+
 class Useradmin(BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    search_fields = ('^email', '^name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Information'), {'fields': ('name',)}),
@@ -15,7 +67,7 @@ class Useradmin(BaseUserAdmin):
             _('Permissions'),
             {'fields': ('is_active', 'is_staff', 'is_superuser')}
         ),
-        (_('Important dates'), {'fields': ('last_login',)})
+        (_('Important dates'), {'fields': ('last_login', 'deleted_at')})
     )
     add_fieldsets = (
         (None, {
@@ -25,6 +77,23 @@ class Useradmin(BaseUserAdmin):
     )
 
 
+class TagAdmin(LargeTableAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('^name',)
+
+
+class IngredientAdmin(LargeTableAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('^name',)
+
+
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ('title', 'user', 'time_minutes', 'price')
+    search_fields = ('^title',)
+    autocomplete_fields = ('user', 'tags', 'ingredients')
+
+
 admin.site.register(models.User, Useradmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
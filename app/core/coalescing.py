@@ -0,0 +1,119 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.response import Response
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = None
+
+
+class SingleFlight:
+    """Run a function once for the concurrent calls with the same key
+
+    Calls arriving while it runs wait for its result, at most wait seconds
+    (ttl by default) before running the function themselves, and calls
+    within ttl seconds after it returned get the same result. Keys are
+    grouped, by user for instance: invalidating a group makes its next
+    calls run the function again.
+    """
+
+    def __init__(self, ttl, wait=None):
+        self.ttl = ttl
+        self.wait = ttl if wait is None else wait
+        self._groups = {}
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    def do(self, group, key, func):
+        """Return func(), or the result of the call running it for key"""
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            flights = self._groups.setdefault(group, {})
+            flight = flights.get(key)
+            leader = flight is None or (flight.done.is_set() and
+                                        flight.expires <= now)
+            if leader:
+                flight = flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.wait):
+                return func()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+        except BaseException as exc:
+            flight.error = exc
+            with self._lock:
+                if flights.get(key) is flight:
+                    del flights[key]
+            raise
+        finally:
+            flight.expires = time.monotonic() + self.ttl
+            flight.done.set()
+        return flight.result
+
+    def invalidate(self, group):
+        """Stop sharing the results computed so far for the group
+
+        Calls already waiting still get the running result, the next ones
+        start a new flight.
+        """
+        with self._lock:
+            self._groups.pop(group, None)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+
+    def _sweep(self, now):
+        """Drop the expired results and empty groups, at most once per ttl"""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.ttl
+        for group, flights in list(self._groups.items()):
+            for key, flight in list(flights.items()):
+                if flight.done.is_set() and flight.expires <= now:
+                    del flights[key]
+            if not flights:
+                del self._groups[group]
+
+
+READS = SingleFlight(settings.COALESCE_READS_TTL_MS / 1000)
+
+
+class CoalescedReadMixin:
+    """Share list and retrieve between concurrent identical requests
+
+    Requests of the same user for the same URL run the queries and the
+    serialization once, then each renders its own response. The results
+    of a user must be invalidated in READS whenever their data changes.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._coalesce(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._coalesce(super().retrieve, request, *args, **kwargs)
+
+    def _coalesce(self, view, request, *args, **kwargs):
+        if not settings.COALESCE_READS:
+            return view(request, *args, **kwargs)
+
+        def read():
+            response = view(request, *args, **kwargs)
+            return response.data, response.status_code
+
+        data, status = READS.do(request.user.pk,
+                                request.build_absolute_uri(), read)
+        return Response(data, status=status)
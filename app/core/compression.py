@@ -0,0 +1,174 @@
+"""
+Negotiated response compression.
+
+Brotli is used when the brotli package is installed and the client
+accepts it, gzip otherwise.
+"""
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+
+def get_brotli():
+    """Return the brotli module if it is installed, imported on first use"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings():
+    """Return the encodings the server can produce, preferred first"""
+    if get_brotli() is None:
+        return ('gzip',)
+    return ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Return the q-value of each content coding of an Accept-Encoding"""
+    result = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        result[coding] = quality
+    return result
+
+
+def is_compressible(content_type, size):
+    """Return whether a body of this type and size is worth compressing"""
+    content_type = content_type.split(';')[0].strip()
+    return size >= settings.COMPRESSION_MIN_SIZE and \
+        content_type.startswith(settings.COMPRESSION_CONTENT_TYPES)
+
+
+def negotiate_encoding(request):
+    """Return the encoding accepted by the client, None for identity"""
+    accepted = accepted_encodings(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    default = accepted.get('*', 0.0)
+    quality, _, encoding = max(
+        (accepted.get(encoding, default), -rank, encoding)
+        for rank, encoding in enumerate(available_encodings())
+    )
+    return encoding if quality > 0 else None
+
+
+def compress(content, encoding):
+    """Return the content compressed with the encoding"""
+    if encoding == 'br':
+        return get_brotli().compress(
+            content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, settings.COMPRESSION_GZIP_LEVEL)
+
+
+def compress_response(request, response):
+    """Compress the content of a response in place when it is worth it"""
+    if response.streaming or response.has_header('Content-Encoding'):
+        return response
+    if not is_compressible(response.get('Content-Type', ''),
+                           len(response.content)):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return response
+
+    compressed = compress(response.content, encoding)
+    if len(compressed) >= len(response.content):
+        return response
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    response['Content-Encoding'] = encoding
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+
+class PrerenderedResponse(Response):
+    """Response whose body was rendered, and maybe compressed, before"""
+
+    def __init__(self, data, content, content_type):
+        super().__init__(data)
+        self.prerendered_content = content
+        self['Content-Type'] = content_type
+
+    @property
+    def rendered_content(self):
+        return self.prerendered_content
+
+
+class CachedResponseMixin:
+    """Cache the JSON responses of the cached_actions, compressed
+
+    Entries are kept per user, URL and cache version, with the data, the
+    rendered body and its compressed copy for each encoding asked so far:
+    a hit skips the queries, the serialization and the compression.
+    get_cache_version() must change whenever the response would.
+    """
+    cached_actions = ()
+
+    def get_cache_version(self):
+        raise NotImplementedError('.get_cache_version() must be overridden')
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, view, request, *args, **kwargs):
+        if self.action not in self.cached_actions or \
+                not settings.RESPONSE_CACHE_TIMEOUT or \
+                request.accepted_renderer.format != 'json':
+            return view(request, *args, **kwargs)
+
+        url = f'{request.accepted_media_type} {request.build_absolute_uri()}'
+        key = 'response:{}:{}:{}'.format(
+            request.user.pk, self.get_cache_version(),
+            hashlib.md5(url.encode()).hexdigest()
+        )
+        entry = cache.get(key)
+        changed = entry is None
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response = self.finalize_response(request, response, *args,
+                                              **kwargs)
+            response.render()
+            entry = {'data': response.data,
+                     'content_type': response['Content-Type'],
+                     'identity': response.content}
+
+        compressible = is_compressible(entry['content_type'],
+                                       len(entry['identity']))
+        encoding = negotiate_encoding(request) if compressible else None
+        if encoding is not None and encoding not in entry:
+            entry[encoding] = compress(entry['identity'], encoding)
+            changed = True
+        if changed:
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+
+        response = PrerenderedResponse(entry['data'],
+                                       entry[encoding or 'identity'],
+                                       entry['content_type'])
+        if compressible:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        return response
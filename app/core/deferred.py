@@ -0,0 +1,35 @@
+import threading
+
+from django.db import transaction
+
+
+_local = threading.local()
+
+
+def _flush(batch_key, flush):
+    items = _local.batches.pop(batch_key, None)
+    if items:
+        flush(items)
+
+
+def defer_until_commit(flush, key, value=None, using=None):
+    """Call flush once with the items collected until the commit
+
+    flush gets a dict of the keys given in the transaction, each with its
+    last value, in the order they were first given. The items given in a
+    transaction rolled back are flushed with the next commit of the
+    thread, so flush must only recompute from the database. Outside of a
+    transaction flush is called at once with this item only.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        flush({key: value})
+        return
+
+    if not hasattr(_local, 'batches'):
+        _local.batches = {}
+    batch_key = (connection.alias, flush)
+    _local.batches.setdefault(batch_key, {})[key] = value
+    # The first callback to run flushes the batch, the others find it gone.
+    # One is registered per item as a rollback drops those of its savepoint
+    transaction.on_commit(lambda: _flush(batch_key, flush), using)
@@ -0,0 +1,127 @@
+import json
+import logging
+import traceback
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name, queue='default', max_attempts=3):
+    """Register a function that can be run as a background job"""
+    def decorator(func):
+        TASKS[name] = (func, queue, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, user=None, **payload):
+    """Queue a registered task, its keyword arguments must be JSON"""
+    _, queue, max_attempts = TASKS[name]
+    return Job.objects.create(
+        user=user,
+        queue=queue,
+        name=name,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts
+    )
+
+
+def _lock_queue(queue):
+    """Serialize the claims of a queue between workers on Postgres"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                           [zlib.crc32(queue.encode())])
+
+
+def claim(queue, worker):
+    """Mark the next due job of the queue as running and return it
+
+    Returns None when nothing is due or the queue already runs as many
+    jobs as its concurrency allows. Jobs left running longer than
+    JOB_TIMEOUT, e.g. by a killed worker, are queued again first, or
+    failed once they used all their attempts.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        _lock_queue(queue)
+        stale = Job.objects.filter(
+            queue=queue,
+            status=Job.RUNNING,
+            locked_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT)
+        )
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, locked_by='', locked_at=None,
+            error=f'Still running after {settings.JOB_TIMEOUT}s',
+            finished_at=now
+        )
+        stale.update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+        concurrency = settings.JOB_QUEUES.get(queue, {}).get('concurrency', 1)
+        if Job.objects.filter(queue=queue, status=Job.RUNNING).count() >= \
+                concurrency:
+            return None
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            queue=queue,
+            status=Job.QUEUED,
+            run_after__lte=now
+        ).order_by('run_after', 'id').first()
+        if job is None:
+            return None
+
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_by = worker
+        job.locked_at = now
+        job.save(update_fields=['status', 'attempts', 'locked_by',
+                                'locked_at'])
+        return job
+
+
+def run(job):
+    """Run a claimed job, scheduling a retry with backoff if it fails
+
+    The outcome is only saved while the job is still locked by this run:
+    a run outliving JOB_TIMEOUT doesn't overwrite the run of the next claim.
+    """
+    locked_by, locked_at = job.locked_by, job.locked_at
+    try:
+        func = TASKS[job.name][0]
+        result = func(**json.loads(job.payload))
+    except Exception:
+        logger.exception('Job %s failed', job)
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = json.dumps(result)
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.locked_at = None
+    fields = ('status', 'result', 'error', 'run_after', 'finished_at',
+              'locked_by', 'locked_at')
+    updated = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_by=locked_by,
+        locked_at=locked_at
+    ).update(**{field: getattr(job, field) for field in fields})
+    if not updated:
+        logger.warning('Job %s was claimed again, its outcome is dropped',
+                       job)
+    return job
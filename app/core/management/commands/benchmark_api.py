@@ -0,0 +1,213 @@
+import json
+import math
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.settings import api_settings
+
+from core.middleware import QueryStats
+from core.models import Recipe
+from user.tokens import issue_token
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def sample_image():
+    """Return a new upload of a small JPEG, the same content every time"""
+    image = BytesIO()
+    Image.new('RGB', (64, 64)).save(image, format='JPEG')
+    image.seek(0)
+    image.name = 'benchmark.jpg'
+    return {'image': image}
+
+
+def endpoints(user, password):
+    """Return the (name, method, url, data) requests to benchmark
+
+    data is sent as the query string of a GET, as JSON otherwise, or as a
+    multipart form when it is a function returning the form.
+    """
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    if recipe is None:
+        raise CommandError(f'{user.email} has no recipes, seed data first')
+    tags = list(recipe.tags.values_list('id', flat=True))
+    ingredients = list(recipe.ingredients.values_list('id', flat=True))
+    tag_ids = ','.join(str(pk) for pk in tags)
+    recipe_list = reverse('recipe:recipe-list')
+    recipe_detail = reverse('recipe:recipe-detail', args=[recipe.id])
+    recipe_data = {'title': 'Benchmark', 'time_minutes': 10,
+                   'price': '5.00', 'tags': tags, 'ingredients': ingredients}
+
+    return [
+        ('tag-list', 'get', reverse('recipe:tag-list'), None),
+        ('tag-list-assigned', 'get', reverse('recipe:tag-list'),
+         {'assigned_only': 1}),
+        ('ingredient-list', 'get', reverse('recipe:ingredient-list'), None),
+        ('recipe-list', 'get', recipe_list, None),
+        ('recipe-list-by-tags', 'get', recipe_list, {'tags': tag_ids}),
+        ('recipe-detail', 'get', recipe_detail, None),
+        ('recipe-create', 'post', recipe_list, recipe_data),
+        ('recipe-update', 'put', recipe_detail, recipe_data),
+        ('recipe-partial-update', 'patch', recipe_detail,
+         {'title': 'Benchmark'}),
+        ('recipe-upload-image', 'post',
+         reverse('recipe:recipe-upload-image', args=[recipe.id]),
+         sample_image),
+        ('tag-create', 'post', reverse('recipe:tag-list'),
+         {'name': 'Benchmark'}),
+        ('ingredient-create', 'post', reverse('recipe:ingredient-list'),
+         {'name': 'Benchmark'}),
+        ('user-me', 'get', reverse('user:me'), None),
+        ('user-create', 'post', reverse('user:create'),
+         {'email': 'bench-new@example.com', 'password': 'benchpass',
+          'name': 'Benchmark'}),
+        ('user-token', 'post', reverse('user:token'),
+         {'email': user.email, 'password': password}),
+    ]
+
+
+def request(client, method, url, data):
+    """Return a function sending the request, its writes rolled back
+
+    Rolling back keeps every iteration of a write against the same rows.
+    Uploaded images are content-addressed, so the storage keeps one copy.
+    """
+    if method == 'get':
+        return lambda: client.get(url, data)
+
+    def send():
+        if callable(data):
+            kwargs = {'data': data()}
+        else:
+            kwargs = {'data': json.dumps(data),
+                      'content_type': 'application/json'}
+        with transaction.atomic():
+            response = getattr(client, method)(url, **kwargs)
+            transaction.set_rollback(True)
+        return response
+    return send
+
+
+class Command(BaseCommand):
+    """Django command to time the API endpoints against seeded data"""
+
+    help = 'Benchmark the REST API endpoints and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='bench-user-0@example.com',
+                            help='Seeded user to run the requests as')
+        parser.add_argument('--password', default='benchpass')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--label', default='',
+                            help='Free text to identify the run')
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--coalesce', action='store_true',
+                            help='Let the repeated reads share their result')
+        parser.add_argument('--accept-encoding', default='',
+                            help='Accept-Encoding header of the requests, '
+                                 'such as "gzip" or "br"')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist')
+        client = Client(HTTP_HOST=options['host'],
+                        HTTP_AUTHORIZATION=f'Token {issue_token(user)}',
+                        HTTP_ACCEPT_ENCODING=options['accept_encoding'])
+
+        # The same user repeats the same requests, throttles would answer
+        # most of them with a 429
+        unthrottled = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+            scope: None for scope in api_settings.DEFAULT_THROTTLE_RATES
+        })
+        results = {}
+        for name, method, url, data in endpoints(user, options['password']):
+            with override_settings(COALESCE_READS=options['coalesce'],
+                                   REST_FRAMEWORK=unthrottled):
+                results[name] = self._run(client, method, url, data, options)
+            self.stdout.write(
+                f'{name:<22} p50 {results[name]["p50_ms"]:8.2f} ms  '
+                f'p99 {results[name]["p99_ms"]:8.2f} ms  '
+                f'cpu {results[name]["cpu_ms"]:7.2f} ms  '
+                f'{results[name]["bytes"]:8d} B  '
+                f'{results[name]["queries"]:4d} queries  '
+                f'{results[name]["peak_memory_kb"]:9.1f} KiB'
+            )
+
+        report = {
+            'label': options['label'],
+            'timestamp': time.time(),
+            'iterations': options['iterations'],
+            'accept_encoding': options['accept_encoding'],
+            'dataset': {
+                'users': get_user_model().objects.count(),
+                'recipes': Recipe.objects.count(),
+                'recipes_for_user': Recipe.objects.filter(user=user).count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def _run(self, client, method, url, data, options):
+        """Time one endpoint, then measure its queries and peak memory
+
+        The CPU time is the time of this process, so it includes the test
+        client and the database when it is SQLite.
+        """
+        send = request(client, method, url, data)
+        for _ in range(options['warmup']):
+            send()
+
+        timings = []
+        cpu_timings = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            response = send()
+            cpu_timings.append((time.process_time() - cpu_start) * 1000)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        queries = QueryStats()
+        with connection.execute_wrapper(queries):
+            send()
+        tracemalloc.start()
+        try:
+            send()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'bytes': len(response.content),
+            'encoding': response.get('Content-Encoding', 'identity'),
+            'cpu_ms': statistics.mean(cpu_timings),
+            'mean_ms': statistics.mean(timings),
+            'min_ms': min(timings),
+            'p50_ms': percentile(timings, 50),
+            'p90_ms': percentile(timings, 90),
+            'p99_ms': percentile(timings, 99),
+            'max_ms': max(timings),
+            'queries': queries.count,
+            'peak_memory_kb': peak / 1024,
+        }
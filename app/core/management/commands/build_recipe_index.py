@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import similarity
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the recipe similarity index"""
+
+    help = 'Recompute the MinHash signatures and LSH buckets of the recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Recipes indexed per transaction')
+        parser.add_argument('--user', type=int, dest='user_id',
+                            help='Only index the recipes of this user id')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.alive()
+        if options['user_id']:
+            recipes = recipes.filter(user_id=options['user_id'])
+        if similarity.get_numpy() is None:
+            self.stderr.write('NumPy is not installed, hashing in Python')
+
+        start = time.perf_counter()
+        count = similarity.rebuild(recipes, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} recipes in '
+            f'{time.perf_counter() - start:.1f}s'))
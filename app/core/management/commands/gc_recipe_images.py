@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import RECIPE_IMAGE_DIR, Recipe
+from core.storage import TEMP_DIR, is_content_addressed
+
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Django command to delete the image files no recipe references"""
+
+    help = 'Delete unreferenced recipe images older than the grace period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep files modified more recently')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['grace_hours'] * 3600
+        try:
+            root = default_storage.path('')
+        except NotImplementedError:
+            raise CommandError(
+                'Only storages on the local filesystem can be collected, '
+                'use the lifecycle rules of the object store instead')
+        deleted = 0
+        for name in self._old_files(root, TEMP_DIR, cutoff):
+            deleted += self._delete([name], options['dry_run'])
+
+        batch = []
+        for name in self._old_files(root, RECIPE_IMAGE_DIR, cutoff):
+            if not is_content_addressed(name):
+                continue
+            batch.append(name)
+            if len(batch) >= BATCH_SIZE:
+                deleted += self._collect(batch, options['dry_run'])
+                batch = []
+        deleted += self._collect(batch, options['dry_run'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} files'))
+
+    def _old_files(self, root, directory, cutoff):
+        """Yield the names of the files under directory older than cutoff"""
+        for path, _, filenames in os.walk(os.path.join(root, directory)):
+            for filename in filenames:
+                full_path = os.path.join(path, filename)
+                if os.path.getmtime(full_path) <= cutoff:
+                    yield os.path.relpath(full_path, root) \
+                        .replace(os.sep, '/')
+
+    def _collect(self, names, dry_run):
+        """Delete the names of a batch that no recipe references"""
+        referenced = set(
+            Recipe.objects.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        return self._delete(
+            [name for name in names if name not in referenced], dry_run)
+
+    def _delete(self, names, dry_run):
+        for name in names:
+            self.stdout.write(f'Deleting {name}')
+            if not dry_run:
+                default_storage.delete(name)
+        return len(names)
@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """Return (self_us, cumulative_us, depth, module) for each import"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(self_us), int(cumulative_us), depth, module))
+    return imports
+
+
+class Command(BaseCommand):
+    """Django command to profile the startup of another command"""
+
+    help = 'Time a manage.py command and report its slowest imports'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of imports to report')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs to take the median wall time of')
+        parser.add_argument('command', nargs=argparse.REMAINDER,
+                            help='Command to profile with its arguments')
+
+    def _run(self, *args):
+        env = dict(os.environ,
+                   DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        return subprocess.run(
+            [sys.executable, *args,
+             os.path.join(settings.BASE_DIR, 'manage.py'),
+             *self.command],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+
+    def handle(self, *args, **options):
+        self.command = options['command']
+        if not self.command:
+            raise CommandError('Give the command to profile')
+
+        durations = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            self._run()
+            durations.append(time.perf_counter() - start)
+        imports = parse_importtime(self._run('-X', 'importtime').stderr)
+
+        self.stdout.write(
+            f'{" ".join(self.command)}: median wall time '
+            f'{statistics.median(durations) * 1000:.0f} ms over '
+            f'{options["repeat"]} runs, '
+            f'{sum(i[1] for i in imports if i[2] == 0) / 1000:.0f} ms '
+            f'importing {len(imports)} modules'
+        )
+        self.stdout.write('Slowest top level imports (cumulative ms):')
+        top_level = sorted((i for i in imports if i[2] == 0),
+                           key=lambda i: -i[1])
+        for _, cumulative_us, _, module in top_level[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:9.1f}  {module}')
@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations import operations
+from django.db.migrations.loader import MigrationLoader
+
+from core.operations import AddIndexConcurrently, Backfill, SetNotNull
+
+
+BREAKS_RUNNING_CODE = (
+    'breaks the previous release while it still runs, '
+    'deploy the code that stops using it first'
+)
+
+
+def lint_operation(operation, atomic):
+    """Return why the operation locks a table in use, or None"""
+    if isinstance(operation, operations.SeparateDatabaseAndState):
+        problems = [lint_operation(op, atomic)
+                    for op in operation.database_operations]
+        return '; '.join(problem for problem in problems if problem) or None
+    if isinstance(operation, (AddIndexConcurrently, Backfill)):
+        if atomic:
+            return 'runs in a transaction, set atomic = False'
+    elif isinstance(operation, SetNotNull):
+        return None
+    elif isinstance(operation, operations.AddIndex):
+        return 'blocks writes while the index builds, use AddIndexConcurrently'
+    elif isinstance(operation, operations.AddField):
+        field = operation.field
+        if field.many_to_many:
+            return None
+        if not field.null:
+            return ('adds a NOT NULL column, which rewrites or scans the '
+                    'table, add it nullable and use Backfill')
+        if field.unique or field.db_index:
+            return ('blocks writes while its index builds, add the field '
+                    'without db_index and use AddIndexConcurrently')
+    elif isinstance(operation, operations.AlterField):
+        return ('may rewrite or scan the table under an exclusive lock, '
+                'check the SQL with sqlmigrate')
+    elif isinstance(operation, (operations.AlterUniqueTogether,
+                                operations.AlterIndexTogether)):
+        if operation.option_value:
+            return 'blocks writes while the index builds'
+    elif isinstance(operation, (operations.RemoveField,
+                                operations.RenameField,
+                                operations.RenameModel,
+                                operations.DeleteModel)):
+        return BREAKS_RUNNING_CODE
+    return None
+
+
+def lint_migrations(migrations):
+    """Return the problems of the migrations, given in the order they run
+
+    Operations on models created by one of the migrations are skipped,
+    their tables are new and empty.
+    """
+    created = set()
+    problems = []
+    for migration in migrations:
+        for operation in migration.operations:
+            if isinstance(operation, operations.CreateModel):
+                created.add((migration.app_label, operation.name_lower))
+                continue
+            model = getattr(operation, 'model_name_lower', None) or \
+                getattr(operation, 'name_lower', None)
+            if (migration.app_label, model) in created:
+                continue
+            problem = lint_operation(operation, migration.atomic)
+            if problem:
+                problems.append(
+                    f'{migration.app_label}.{migration.name}: '
+                    f'{operation.describe()}: {problem}')
+    return problems
+
+
+class Command(BaseCommand):
+    """Django command to find migrations that lock tables in use"""
+
+    help = ('Check the unapplied migrations, or the given ones, for '
+            'operations that lock or rewrite tables')
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='?')
+        parser.add_argument('migration_name', nargs='?')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        loader = MigrationLoader(connections[options['database']])
+        app_label = options['app_label']
+        if options['migration_name']:
+            migration = loader.get_migration_by_prefix(
+                app_label, options['migration_name'])
+            targets = [(migration.app_label, migration.name)]
+        else:
+            targets = [
+                key for key in loader.disk_migrations
+                if key not in loader.applied_migrations and
+                (app_label is None or key[0] == app_label)
+            ]
+        plan = []
+        for leaf in loader.graph.leaf_nodes():
+            for key in loader.graph.forwards_plan(leaf):
+                if key in targets and key not in plan:
+                    plan.append(key)
+
+        problems = lint_migrations(
+            loader.graph.nodes[key] for key in plan)
+        for problem in problems:
+            self.stdout.write(problem)
+        if problems:
+            raise CommandError(
+                f'{len(problems)} operations may lock tables in use')
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(plan)} migrations'))
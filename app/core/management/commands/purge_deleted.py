@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from core.purge import purge_recipes, purge_user
+
+
+class Command(BaseCommand):
+    """Django command to delete the soft deleted users and recipes"""
+
+    help = 'Delete users and recipes soft deleted before the retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=float,
+                            default=settings.SOFT_DELETE_RETENTION_HOURS,
+                            help='Keep rows deleted more recently')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.PURGE_BATCH_SIZE,
+                            help='Rows deleted per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            hours=options['retention_hours'])
+        batch_size = options['batch_size']
+
+        recipes = purge_recipes(
+            Recipe.objects.filter(deleted_at__lte=cutoff), batch_size)
+        users = list(
+            get_user_model().objects.filter(deleted_at__lte=cutoff))
+        for user in users:
+            self.stdout.write(f'Purging {user.email}')
+            purge_user(user, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {recipes} recipes and {len(users)} users'))
@@ -0,0 +1,39 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run the queued background jobs"""
+
+    help = 'Run the background jobs of the given queues'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Queue to process, defaults to all')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due')
+        parser.add_argument('--sleep', type=float, default=1,
+                            help='Seconds to wait when no job is due')
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(settings.JOB_QUEUES)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Worker {worker} processing {", ".join(queues)}')
+        while True:
+            ran = False
+            for queue in queues:
+                job = jobs.claim(queue, worker)
+                if job is not None:
+                    job = jobs.run(job)
+                    self.stdout.write(f'{job} {job.status}')
+                    ran = True
+            if not ran:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
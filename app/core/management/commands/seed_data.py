@@ -0,0 +1,118 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Tag, Ingredient, Recipe
+
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Django command to seed a large dataset for benchmarking"""
+
+    help = 'Bulk insert users, recipes, tags and ingredients for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=50,
+                            help='Ingredients per user')
+        parser.add_argument('--links', type=int, default=3,
+                            help='Tags and ingredients linked per recipe')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--password', default='benchpass')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously seeded users first')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        users = get_user_model().objects.filter(
+            email__startswith=f'{prefix}-user-')
+        if options['clear']:
+            users.delete()
+        elif users.exists():
+            self.stderr.write(
+                f'Users with the prefix "{prefix}" already exist, '
+                'use --clear to replace them')
+            return
+
+        rng = random.Random(options['random_seed'])
+        with transaction.atomic():
+            user_ids = self._create_users(options)
+            tag_ids = self._create_named(Tag, user_ids, options['tags'])
+            ingredient_ids = self._create_named(
+                Ingredient, user_ids, options['ingredients'])
+            recipe_ids = self._create_recipes(user_ids, options, rng)
+            self._link(Recipe.tags.through, 'tag_id', recipe_ids, tag_ids,
+                       options['links'], rng)
+            self._link(Recipe.ingredients.through, 'ingredient_id',
+                       recipe_ids, ingredient_ids, options['links'], rng)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users, '
+            f'{sum(map(len, recipe_ids.values()))} recipes, '
+            f'{sum(map(len, tag_ids.values()))} tags and '
+            f'{sum(map(len, ingredient_ids.values()))} ingredients'
+        ))
+
+    def _create_users(self, options):
+        """Create the users sharing a single password hash"""
+        User = get_user_model()
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            (User(email=f'{prefix}-user-{i}@example.com',
+                  name=f'Benchmark user {i}', password=password)
+             for i in range(options['users'])),
+            batch_size=BATCH_SIZE
+        )
+        return list(User.objects.filter(
+            email__startswith=f'{prefix}-user-').values_list('id', flat=True))
+
+    def _create_named(self, model, user_ids, count):
+        """Create `count` named objects per user, return the IDs per user"""
+        name = model._meta.verbose_name
+        model.objects.bulk_create(
+            (model(user_id=user_id, name=f'{name} {i}')
+             for user_id in user_ids for i in range(count)),
+            batch_size=BATCH_SIZE
+        )
+        return self._ids_by_user(model, user_ids)
+
+    def _create_recipes(self, user_ids, options, rng):
+        Recipe.objects.bulk_create(
+            (Recipe(user_id=user_id, title=f'Recipe {i}',
+                    time_minutes=rng.randint(5, 180),
+                    price=rng.randint(100, 99999) / 100)
+             for user_id in user_ids for i in range(options['recipes'])),
+            batch_size=BATCH_SIZE
+        )
+        return self._ids_by_user(Recipe, user_ids)
+
+    def _ids_by_user(self, model, user_ids):
+        ids = {user_id: [] for user_id in user_ids}
+        rows = model.objects.filter(user_id__in=user_ids) \
+            .values_list('user_id', 'id')
+        for user_id, pk in rows.iterator():
+            ids[user_id].append(pk)
+        return ids
+
+    def _link(self, through, field, recipe_ids, related_ids, links, rng):
+        """Link each recipe to random related objects of the same user"""
+        rows = []
+        for user_id, recipes in recipe_ids.items():
+            choices = related_ids[user_id]
+            for recipe_id in recipes:
+                for related_id in rng.sample(choices,
+                                             min(links, len(choices))):
+                    rows.append(
+                        through(recipe_id=recipe_id, **{field: related_id}))
+        through.objects.bulk_create(rows, batch_size=BATCH_SIZE)
@@ -8,6 +8,9 @@ from django.core.management.base import BaseCommand
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    # The checks import every URLconf and view, the database is all we need
+    requires_system_checks = False
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...\n')
         db_conn = None
@@ -0,0 +1,111 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, \
+    StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from core.storage import is_content_addressed
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Return the (start, end) of a single byte range, None for the whole"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _read_range(path, start, length, block_size=8192):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def send_file(request, name, cache_control='private, no-cache'):
+    """Respond with a file of MEDIA_ROOT
+
+    With MEDIA_ACCEL_REDIRECT set the front proxy is told to send the file
+    itself, otherwise it is streamed with conditional and Range support.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    content_type = mimetypes.guess_type(name)[0] or \
+        'application/octet-stream'
+
+    if settings.MEDIA_ACCEL_REDIRECT == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+        response['Cache-Control'] = cache_control
+        return response
+    if settings.MEDIA_ACCEL_REDIRECT == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        response['Cache-Control'] = cache_control
+        return response
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    if is_content_addressed(name):
+        # The storage touches the file when its content is uploaded again
+        etag = '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    else:
+        etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, etag)
+        response['Content-Type'] = content_type
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, path, size, etag):
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _read_range(path, start, length), status=206)
+            response['Content-Length'] = length
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return response
+    return FileResponse(open(path, 'rb'))
@@ -0,0 +1,152 @@
+import bisect
+import threading
+import time
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class Histogram:
+    """Cumulative histogram keyed by a set of label values"""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        """Record a single observation for the given label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0,
+                    'count': 0,
+                }
+            series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def collect(self):
+        """Return the lines of this histogram in the Prometheus format"""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = sorted((
+                (key, dict(value, buckets=list(value['buckets'])))
+                for key, value in self._series.items()
+            ), key=lambda item: item[0])
+        for labelvalues, data in series:
+            labels = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, data['buckets']):
+                cumulative += count
+                bucket_labels = _format_labels(labels + [('le', bound)])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} '
+                             f'{cumulative}')
+            plain = _format_labels(labels)
+            lines.append(f'{self.name}_sum{{{plain}}} {data["sum"]}')
+            lines.append(f'{self.name}_count{{{plain}}} {data["count"]}')
+        return lines
+
+
+class Registry:
+    """In-process collection of metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, labelnames, buckets):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self):
+        """Render every registered metric in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+class ViewTimingMixin:
+    """DRF view mixin recording the time its handler spends out of the DB
+
+    That is mostly the serialization, which the handler runs before the
+    renderer. RequestMetricsMiddleware adds it to the render time.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        stats = getattr(request._request, '_metrics_query_stats', None)
+        request._request._metrics_handler_start = (
+            time.perf_counter(), stats.duration if stats else 0.0)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        django_request = getattr(request, '_request', request)
+        start = getattr(django_request, '_metrics_handler_start', None)
+        if start is not None:
+            stats = getattr(django_request, '_metrics_query_stats', None)
+            query_time = stats.duration - start[1] if stats else 0.0
+            django_request._metrics_serialize_duration = \
+                time.perf_counter() - start[0] - query_time
+        return super().finalize_response(request, response, *args,
+                                         **kwargs)
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Total time spent handling the request',
+    ('view',), DURATION_BUCKETS
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries',
+    'Number of database queries issued by the request',
+    ('view',), COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = REGISTRY.histogram(
+    'http_request_db_seconds',
+    'Time spent executing database queries',
+    ('view',), DURATION_BUCKETS
+)
+REQUEST_RENDER_DURATION = REGISTRY.histogram(
+    'http_request_render_seconds',
+    'Time spent out of the database building and rendering the response',
+    ('view',), DURATION_BUCKETS
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    'http_response_size_bytes',
+    'Size of the response body',
+    ('view',), SIZE_BUCKETS
+)
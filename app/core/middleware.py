@@ -0,0 +1,167 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from core import metrics
+from core.compression import compress_response
+from core.profiling import StackAggregator, StackSampler
+from core.throttling import AdaptiveConcurrencyLimit
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE = StackAggregator(settings.PROFILING_MAX_STACKS)
+
+CONCURRENCY_LIMIT = AdaptiveConcurrencyLimit(
+    settings.LOAD_SHEDDING_MIN_CONCURRENCY,
+    settings.LOAD_SHEDDING_MAX_CONCURRENCY,
+    settings.LOAD_SHEDDING_WINDOW_MS / 1000,
+    settings.LOAD_SHEDDING_TOLERANCE
+)
+
+
+class QueryStats:
+    """Database execute wrapper counting queries and their duration"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """Record query count, DB time, render time and size for each view
+
+    The render time includes the time the handlers of the views using
+    core.metrics.ViewTimingMixin spend out of the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request._metrics_query_stats = stats
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_DURATION.observe(duration, view)
+        metrics.REQUEST_QUERIES.observe(stats.count, view)
+        metrics.REQUEST_DB_DURATION.observe(stats.duration, view)
+        render_duration = getattr(request, '_metrics_render_duration', None)
+        if render_duration is not None:
+            render_duration += getattr(request, '_metrics_serialize_duration',
+                                       0.0)
+            metrics.REQUEST_RENDER_DURATION.observe(render_duration, view)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view)
+
+        if stats.count > settings.REQUEST_QUERY_BUDGET or \
+                duration * 1000 > settings.REQUEST_LATENCY_BUDGET_MS:
+            logger.warning(
+                'Request %s %s (%s) over budget: %d queries, '
+                '%.1f ms in the database, %.1f ms total',
+                request.method, request.path, view, stats.count,
+                stats.duration * 1000, duration * 1000
+            )
+
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF and template responses"""
+        start = time.perf_counter()
+
+        def record_render_duration(rendered):
+            request._metrics_render_duration = time.perf_counter() - start
+
+        response.add_post_render_callback(record_render_duration)
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Answer 503 at once while the process has too many requests running
+
+    The limit adapts to the latency of the requests and the time of their
+    queries, compared to those of the same view before, so the requests
+    are shed before they wait on the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.LOAD_SHEDDING or \
+                request.path.startswith(settings.LOAD_SHEDDING_EXEMPT_PATHS):
+            return self.get_response(request)
+        if not CONCURRENCY_LIMIT.acquire():
+            response = JsonResponse(
+                {'detail': 'Server overloaded, retry later.'}, status=503)
+            response['Retry-After'] = str(settings.LOAD_SHEDDING_RETRY_AFTER)
+            return response
+
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            stats = getattr(request, '_metrics_query_stats', None)
+            query_time = stats.duration / stats.count \
+                if stats is not None and stats.count else None
+            match = request.resolver_match
+            CONCURRENCY_LIMIT.release(time.perf_counter() - start, query_time,
+                                      match.view_name if match else None)
+
+
+class CompressionMiddleware:
+    """Compress the responses with the encoding the client prefers"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return compress_response(request, self.get_response(request))
+
+
+class SamplingProfilerMiddleware:
+    """Sample the stacks of a fraction of the requests to selected views"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sampler = getattr(request, '_profiling_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Start sampling when the view is selected for profiling"""
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None or \
+                view_class.__name__ not in settings.PROFILING_VIEWS:
+            return None
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return None
+        request._profiling_sampler = StackSampler(
+            PROFILE,
+            settings.PROFILING_INTERVAL_MS / 1000
+        ).start()
+        return None
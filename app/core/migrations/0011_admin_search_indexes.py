@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# The admin prefix searches filter on UPPER(column) LIKE 'PREFIX%'
+SEARCH_INDEXES = (
+    ('core_user', 'email'),
+    ('core_user', 'name'),
+    ('core_tag', 'name'),
+    ('core_ingredient', 'name'),
+    ('core_recipe', 'title'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{column}_upper_like '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS {table}_{column}_upper_like')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.1.15 on 2026-10-19 10:46
+
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['deleted_at'], name='recipe_deleted_at_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['deleted_at'], name='user_deleted_at_idx'),
+        ),
+    ]
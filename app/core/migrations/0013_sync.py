@@ -0,0 +1,92 @@
+# Generated by Django 2.1.15 on 2026-10-19 10:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Now
+import django.db.models.deletion
+
+import core.operations
+
+
+def add_without_default(model_name, name, field):
+    """AddField adding a nullable column with no default, to backfill
+
+    Django sets the default of a field, or the current time for auto_now
+    fields, on the new column, which rewrites the table on older Postgres.
+    """
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[migrations.AddField(
+            model_name=model_name, name=name,
+            field=field.__class__(null=True),
+        )],
+        state_operations=[migrations.AddField(
+            model_name=model_name, name=name, field=field,
+        )],
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        add_without_default(
+            'ingredient', 'created_at',
+            models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        add_without_default(
+            'ingredient', 'updated_at',
+            models.DateTimeField(auto_now=True, null=True),
+        ),
+        add_without_default(
+            'recipe', 'created_at',
+            models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        add_without_default(
+            'recipe', 'updated_at',
+            models.DateTimeField(auto_now=True, null=True),
+        ),
+        add_without_default(
+            'tag', 'created_at',
+            models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        add_without_default(
+            'tag', 'updated_at',
+            models.DateTimeField(auto_now=True, null=True),
+        ),
+        add_without_default(
+            'user', 'change_seq',
+            models.BigIntegerField(default=0, null=True),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='changelog',
+            unique_together={('user', 'seq'), ('model', 'object_id')},
+        ),
+        core.operations.Backfill('ingredient', 'created_at', Now()),
+        core.operations.Backfill('ingredient', 'updated_at', F('created_at')),
+        core.operations.Backfill('recipe', 'created_at', Now()),
+        core.operations.Backfill('recipe', 'updated_at', F('created_at')),
+        core.operations.Backfill('tag', 'created_at', Now()),
+        core.operations.Backfill('tag', 'updated_at', F('created_at')),
+        core.operations.Backfill('user', 'change_seq', 0),
+    ]
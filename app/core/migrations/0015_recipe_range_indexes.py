@@ -0,0 +1,25 @@
+# Generated by Django 2.1.15 on 2026-10-19 10:53
+
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_recipe_similarity'),
+    ]
+
+    operations = [
+        core.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price'], name='recipe_user_price_idx'),
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes'], name='recipe_user_time_idx'),
+        ),
+    ]
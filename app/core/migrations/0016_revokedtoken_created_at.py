@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0015_recipe_range_indexes'),
+    ]
+
+    operations = [
+        # Without the current time Django would set on the new column
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.AddField(
+                model_name='revokedtoken',
+                name='created_at',
+                field=models.DateTimeField(null=True),
+            )],
+            state_operations=[migrations.AddField(
+                model_name='revokedtoken',
+                name='created_at',
+                field=models.DateTimeField(auto_now_add=True, null=True),
+            )],
+        ),
+        core.operations.AddIndexConcurrently(
+            model_name='revokedtoken',
+            index=models.Index(fields=['created_at'], name='revokedtoken_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+import core.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_revokedtoken_created_at'),
+    ]
+
+    operations = [
+        # Users created by the release before 0013 while it was migrating
+        core.operations.Backfill('user', 'change_seq', 0),
+        core.operations.SetNotNull(
+            model_name='user',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,17 +1,36 @@
 import os
 import uuid
 
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
 
+from core.storage import is_content_addressed
+
+
+RECIPE_IMAGE_DIR = 'uploads/recipe'
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path"""
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
-    return os.path.join('uploads/recipe/', filename)
+    return os.path.join(RECIPE_IMAGE_DIR + '/', filename)
+
+
+def release_recipe_image(name):
+    """Delete an image file once no recipe references it anymore
+
+    Content addressed files are left to `manage.py gc_recipe_images`: an
+    upload of the same content may be reusing the file right now, the
+    grace period of the collector keeps it.
+    """
+    if name and not is_content_addressed(name) and \
+            not Recipe.objects.filter(image=name).exists():
+        default_storage.delete(name)
 
 
 class UserManager(BaseUserManager):
@@ -41,11 +60,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    change_seq = models.BigIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='user_deleted_at_idx'),
+        ]
+
+    def soft_delete(self):
+        """Deactivate the user, the purge command deletes it later"""
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_active', 'deleted_at'])
+
 
 class Tag(models.Model):
     """Tag to be used for the recipe"""
@@ -54,6 +86,8 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
 
     def __str__(self):
         return self.name
@@ -66,11 +100,20 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Exclude the recipes waiting to be purged"""
+        return self.filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     """Recipe object"""
 
@@ -85,6 +128,123 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'price'],
+                         name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes'],
+                         name='recipe_user_time_idx'),
+            models.Index(fields=['deleted_at'],
+                         name='recipe_deleted_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of the tags and ingredients of a recipe"""
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE
+    )
+    minhash = models.BinaryField()
+
+
+class RecipeBucket(models.Model):
+    """LSH bucket of a band of a recipe signature"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'key'])]
+
+
+class RevokedToken(models.Model):
+    """Signed auth token revoked before its expiry"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'],
+                         name='revokedtoken_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.jti
+
+
+class ChangeLog(models.Model):
+    """Last change of a recipe, tag or ingredient, for the sync endpoint
+
+    seq comes from User.change_seq, which is incremented under the row
+    lock of the user, so the changes of a user commit in seq order.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    seq = models.BigIntegerField()
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = (('user', 'seq'), ('model', 'object_id'))
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} @{self.seq}'
+
+
+class Job(models.Model):
+    """Task queued to run outside of the request"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE
+    )
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=255)
+    payload = models.TextField(default='{}')
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['queue', 'status', 'run_after'])]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,176 @@
+"""
+Migration operations for large tables.
+
+AddIndexConcurrently and Backfill must run in migrations with
+atomic = False: the first because Postgres can't build an index
+concurrently in a transaction, the second so each batch commits alone.
+SetNotNull then makes a backfilled column NOT NULL.
+"""
+import time
+
+from django.db import migrations, transaction
+
+
+def _require_non_atomic(schema_editor, operation):
+    if schema_editor.atomic_migration:
+        raise ValueError(
+            f'{operation.__class__.__name__} needs a migration with '
+            f'atomic = False')
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex that doesn't block writes while the index builds
+
+    On Postgres the index is built with CREATE INDEX CONCURRENTLY, after
+    dropping an invalid index left by an earlier failed attempt. Other
+    databases build it like AddIndex.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(schema_editor, self)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT NOT indisvalid FROM pg_index '
+                'WHERE indexrelid = to_regclass(%s)',
+                [self.index.name]
+            )
+            row = cursor.fetchone()
+        if row and row[0]:
+            schema_editor.execute('DROP INDEX CONCURRENTLY ' +
+                                  schema_editor.quote_name(self.index.name))
+        sql = str(self.index.create_sql(model, schema_editor))
+        schema_editor.execute(
+            sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(schema_editor, self)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS '
+                f'{schema_editor.quote_name(self.index.name)}')
+
+    def describe(self):
+        return super().describe() + ' concurrently'
+
+
+def backfill(queryset, field_name, value, batch_size, pause):
+    """Set the field where it is NULL, one transaction per batch of pks
+
+    Sleeps pause seconds between batches to leave room to other writes.
+    Returns the number of rows updated.
+    """
+    last = None
+    updated = 0
+    while True:
+        batch = queryset.filter(**{f'{field_name}__isnull': True})
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        ids = list(batch.order_by('pk').values_list('pk', flat=True)
+                   [:batch_size])
+        if not ids:
+            return updated
+        with transaction.atomic(using=queryset.db):
+            updated += queryset.filter(pk__in=ids) \
+                .update(**{field_name: value})
+        last = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+class Backfill(migrations.operations.base.Operation):
+    """Fill a nullable column in batches, after AddField added it
+
+    value is a constant or an expression such as F('other_field'). Make
+    the column NOT NULL with SetNotNull in a later migration, once the
+    code writing it is deployed, after backfilling it again.
+    """
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, field_name, value, batch_size=1000,
+                 pause=0.1):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.value = value
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def deconstruct(self):
+        kwargs = {
+            'model_name': self.model_name,
+            'field_name': self.field_name,
+            'value': self.value,
+            'batch_size': self.batch_size,
+            'pause': self.pause,
+        }
+        return self.__class__.__qualname__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        _require_non_atomic(schema_editor, self)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        alias = schema_editor.connection.alias
+        if self.allow_migrate_model(alias, model):
+            backfill(model._default_manager.using(alias), self.field_name,
+                     self.value, self.batch_size, self.pause)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        pass
+
+    def describe(self):
+        return (f'Backfill {self.model_name}.{self.field_name} in batches '
+                f'of {self.batch_size}')
+
+
+class SetNotNull(migrations.AlterField):
+    """AlterField making a backfilled column NOT NULL, nothing else
+
+    On Postgres a NOT VALID check constraint is validated first, which
+    doesn't block writes, and SET NOT NULL uses it instead of scanning the
+    table under an exclusive lock (Postgres 12 and later). Other databases
+    run AlterField.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        quote = schema_editor.quote_name
+        column = model._meta.get_field(self.name).column
+        table = quote(model._meta.db_table)
+        constraint = quote(f'{model._meta.db_table}_{column}_not_null'[:63])
+        column = quote(column)
+        for sql in (
+            f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}',
+            f'ALTER TABLE {table} ADD CONSTRAINT {constraint} '
+            f'CHECK ({column} IS NOT NULL) NOT VALID',
+            f'ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}',
+            f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL',
+            f'ALTER TABLE {table} DROP CONSTRAINT {constraint}',
+        ):
+            schema_editor.execute(sql)
+
+    def describe(self):
+        return f'Set {self.name} on {self.model_name} NOT NULL'
@@ -0,0 +1,76 @@
+import sys
+import threading
+from collections import Counter
+
+
+OVERFLOW_STACK = '[truncated]'
+
+
+class StackAggregator:
+    """Bounded counter of collapsed stacks, ready for flamegraph.pl"""
+
+    def __init__(self, max_stacks):
+        self.max_stacks = max_stacks
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, stack, count=1):
+        """Count a stack, folding new ones once the limit is reached"""
+        with self._lock:
+            if stack not in self._stacks and \
+                    len(self._stacks) >= self.max_stacks:
+                stack = OVERFLOW_STACK
+            self._stacks[stack] += count
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+
+    def collapsed(self):
+        """Return the stacks in the collapsed `frame;frame count` format"""
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+
+def _collapse(frame, max_depth):
+    """Turn a frame into a `module:function;...` string, outermost first"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Periodically sample the stack of a thread from a helper thread"""
+
+    def __init__(self, aggregator, interval, thread_id=None, max_depth=64):
+        self.aggregator = aggregator
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.max_depth = max_depth
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.aggregator.add(_collapse(frame, self.max_depth))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.models import ChangeLog, Ingredient, Job, Recipe, RecipeBucket, \
+    RecipeSignature, Tag, release_recipe_image
+
+
+def _raw_delete(queryset):
+    """Delete the rows with one DELETE, skipping the Python collector"""
+    queryset._raw_delete(queryset.db)
+
+
+def delete_in_batches(queryset, batch_size, related=()):
+    """Delete the queryset a batch per transaction, return the count
+
+    related lists the (model, field) pairs pointing at the queryset that
+    are deleted along with each batch. Signals are not sent.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            for related_model, field in related:
+                _raw_delete(related_model.objects.filter(
+                    **{f'{field}__in': ids}))
+            _raw_delete(model.objects.filter(pk__in=ids))
+        deleted += len(ids)
+
+
+def purge_recipes(queryset, batch_size):
+    """Delete the recipes and their links in batches, then their images"""
+    deleted = 0
+    while True:
+        rows = list(queryset.values_list('pk', 'image')[:batch_size])
+        if not rows:
+            return deleted
+        ids = [pk for pk, _ in rows]
+        delete_in_batches(
+            Recipe.objects.filter(pk__in=ids),
+            batch_size,
+            related=((Recipe.tags.through, 'recipe_id'),
+                     (Recipe.ingredients.through, 'recipe_id'),
+                     (RecipeBucket, 'recipe_id'),
+                     (RecipeSignature, 'recipe_id'))
+        )
+        for _, image in rows:
+            release_recipe_image(image)
+        deleted += len(ids)
+
+
+def purge_user(user, batch_size):
+    """Delete the user after its rows, a batch per transaction"""
+    purge_recipes(Recipe.objects.filter(user=user), batch_size)
+    delete_in_batches(Tag.objects.filter(user=user), batch_size,
+                      related=((Recipe.tags.through, 'tag_id'),))
+    delete_in_batches(Ingredient.objects.filter(user=user), batch_size,
+                      related=((Recipe.ingredients.through,
+                                'ingredient_id'),))
+    delete_in_batches(Job.objects.filter(user=user), batch_size)
+    delete_in_batches(ChangeLog.objects.filter(user=user), batch_size)
+    # What is left is small, let the collector handle any other relation
+    get_user_model().objects.filter(pk=user.pk).delete()
@@ -0,0 +1,19 @@
+import json
+
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of background jobs"""
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'result',
+                  'created_at', 'finished_at')
+        read_only_fields = fields
+
+    def get_result(self, job):
+        return json.loads(job.result) if job.result else None
@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+
+from core.object_store import get_client
+
+
+CONTENT_ADDRESSED_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+TEMP_DIR = '.tmp'
+
+
+def is_content_addressed(name):
+    """Return whether a stored name can never change content"""
+    return bool(CONTENT_ADDRESSED_RE.search(name))
+
+
+def content_addressed_name(name, hexdigest):
+    """Return `<directory>/<hash[:2]>/<hash><ext>` for an uploaded name"""
+    directory, filename = os.path.split(name)
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, hexdigest[:2], hexdigest + ext) \
+        .replace(os.sep, '/')
+
+
+def _spool(content, target):
+    """Copy the content to a file object, returning its SHA-256"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+        target.write(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage naming every file after the SHA-256 of its content
+
+    The hash is computed while the upload is streamed to a temporary file,
+    which is then moved to `<directory>/<hash[:2]>/<hash><ext>`. Uploading
+    the same content again reuses the existing file.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            hexdigest = _spool(content, temp)
+        name = content_addressed_name(name, hexdigest)
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(temp.name)
+            os.utime(full_path)
+            return name
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(temp.name, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+class ObjectStorage(Storage):
+    """Content addressed storage in an S3 compatible object store
+
+    The client is configured with OBJECT_STORAGE. Besides the regular
+    storage API it presigns URLs so clients upload and download the files
+    directly from the object store.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or get_client(settings.OBJECT_STORAGE)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.client.get_object(name), name=name)
+
+    def _save(self, name, content):
+        with tempfile.SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as spool:
+            name = content_addressed_name(name, _spool(content, spool))
+            if self.client.head_object(name) is None:
+                spool.seek(0)
+                self.client.put_object(
+                    name, spool.read(),
+                    mimetypes.guess_type(name)[0] or
+                    'application/octet-stream'
+                )
+        return name
+
+    def exists(self, name):
+        return self.client.head_object(name) is not None
+
+    def delete(self, name):
+        self.client.delete_object(name)
+
+    def size(self, name):
+        return self.client.head_object(name)['size']
+
+    def url(self, name):
+        return self.client.presigned_url(
+            'GET', name, expires_in=settings.OBJECT_STORAGE['URL_EXPIRES'])
+
+    def presigned_upload(self, name, hexdigest):
+        """Return the URL and headers to PUT the content with this hash
+
+        The checksum header is signed, so the object store rejects any
+        other content.
+        """
+        name = content_addressed_name(name, hexdigest)
+        headers = {
+            'Content-Type': mimetypes.guess_type(name)[0] or
+            'application/octet-stream',
+            'x-amz-checksum-sha256': base64.b64encode(
+                bytes.fromhex(hexdigest)).decode(),
+        }
+        url = self.client.presigned_url(
+            'PUT', name, expires_in=settings.OBJECT_STORAGE['URL_EXPIRES'],
+            headers=headers
+        )
+        return name, url, headers
@@ -0,0 +1,29 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner, default_test_processes
+
+
+class ParallelDiscoverRunner(DiscoverRunner):
+    """Test runner using all the available processes by default
+
+    The uploads of the run go to a temporary MEDIA_ROOT, removed at the end.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(parallel=default_test_processes())
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Set before the storage first reads it. override_settings would
+        # hide SETTINGS_MODULE from the commands starting a subprocess
+        self.media_root_before = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='recipe-test-media-')
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        settings.MEDIA_ROOT = self.media_root_before
+        super().teardown_test_environment(**kwargs)
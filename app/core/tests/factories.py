@@ -0,0 +1,41 @@
+import itertools
+
+from django.contrib.auth import get_user_model
+
+from core.models import Tag, Ingredient, Recipe
+
+
+_sequence = itertools.count()
+
+
+def create_user(email=None, password='testpass', **params):
+    """Create and return a user, with a unique email by default"""
+    if email is None:
+        email = f'user{next(_sequence)}@example.com'
+    return get_user_model().objects.create_user(email, password, **params)
+
+
+def create_tag(user, name='Main tag'):
+    """Create and return a tag"""
+    return Tag.objects.create(user=user, name=name)
+
+
+def create_ingredient(user, name='Cinnamon'):
+    """Create and return an ingredient"""
+    return Ingredient.objects.create(user=user, name=name)
+
+
+def create_recipe(user, tags=(), ingredients=(), **params):
+    """Create and return a recipe linked to the given tags and ingredients"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    if tags:
+        recipe.tags.add(*tags)
+    if ingredients:
+        recipe.ingredients.add(*ingredients)
+    return recipe
@@ -1,7 +1,11 @@
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 
+from core.middleware import QueryStats
+from core.tests.factories import create_user, create_recipe, create_tag
+
 
 class AdminSiteTests(TestCase):
 
@@ -39,3 +43,47 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_recipe_changelist_queries_bounded(self):
+        """Test the recipe list doesn't query per row or per user"""
+        url = reverse('admin:core_recipe_changelist')
+        create_recipe(self.user)
+        self.client.get(url)
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            self.client.get(url)
+        queries = stats.count
+
+        for i in range(5):
+            create_recipe(create_user(), title=f'Recipe {i}')
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            res = self.client.get(url)
+
+        self.assertContains(res, 'Recipe 4')
+        self.assertEqual(stats.count, queries)
+
+    def test_search_by_prefix(self):
+        """Test the admin searches match the start of the field"""
+        create_tag(self.user, name='Vegan')
+        create_tag(self.user, name='Not vegan')
+        url = reverse('admin:core_tag_changelist')
+
+        res = self.client.get(url, {'q': 'veg'})
+
+        self.assertContains(res, 'Vegan')
+        self.assertNotContains(res, 'Not vegan')
+
+    def test_user_autocomplete(self):
+        """Test users are picked by searching instead of a full select"""
+        url = reverse('admin:core_recipe_add')
+        res = self.client.get(url)
+        self.assertNotContains(res, self.user.email)
+
+        res = self.client.get(reverse('admin:core_user_autocomplete'),
+                              {'term': 'test@'})
+
+        self.assertEqual(
+            [result['text'] for result in res.json()['results']],
+            [self.user.email]
+        )
@@ -0,0 +1,156 @@
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.coalescing import READS, SingleFlight
+from core.tests.factories import create_recipe, create_tag, create_user
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class SingleFlightTests(TestCase):
+    """Test sharing the result of a function between concurrent calls"""
+
+    def test_concurrent_calls_share_one_run(self):
+        """Test that calls waiting on a running call get its result"""
+        flights = SingleFlight(ttl=60)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flights.do(1, 'key', compute)))
+        leader.start()
+        started.wait(5)
+        waiters = [
+            threading.Thread(
+                target=lambda: results.append(flights.do(1, 'key', compute)))
+            for _ in range(4)
+        ]
+        for waiter in waiters:
+            waiter.start()
+        release.set()
+        for thread in [leader, *waiters]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 5)
+
+    def test_result_expires(self):
+        """Test that calls after the TTL run the function again"""
+        flights = SingleFlight(ttl=0)
+        calls = []
+
+        flights.do(1, 'key', lambda: calls.append(1))
+        flights.do(1, 'key', lambda: calls.append(1))
+
+        self.assertEqual(len(calls), 2)
+
+    def test_invalidate_group(self):
+        """Test that an invalidated group runs the function again"""
+        flights = SingleFlight(ttl=60)
+
+        self.assertEqual(flights.do(1, 'key', lambda: 'old'), 'old')
+        self.assertEqual(flights.do(2, 'key', lambda: 'other'), 'other')
+        flights.invalidate(1)
+
+        self.assertEqual(flights.do(1, 'key', lambda: 'new'), 'new')
+        self.assertEqual(flights.do(2, 'key', lambda: 'new'), 'other')
+
+    def test_invalidated_groups_forgotten(self):
+        """Test that nothing is kept for a group once its results expire"""
+        flights = SingleFlight(ttl=0)
+        for user in range(100):
+            flights.do(user, 'key', lambda: 'result')
+            flights.invalidate(user)
+
+        flights.do(0, 'key', lambda: 'result')
+
+        self.assertEqual(len(flights._groups), 1)
+
+    def test_waiting_call_runs_after_timeout(self):
+        """Test that a call doesn't wait past the timeout for a stuck run"""
+        flights = SingleFlight(ttl=60, wait=0.01)
+        started = threading.Event()
+        release = threading.Event()
+
+        def stuck():
+            started.set()
+            release.wait(5)
+            return 'stuck'
+
+        leader = threading.Thread(target=flights.do, args=(1, 'key', stuck))
+        leader.start()
+        started.wait(5)
+        try:
+            self.assertEqual(flights.do(1, 'key', lambda: 'own'), 'own')
+        finally:
+            release.set()
+            leader.join(5)
+
+    def test_error_not_kept(self):
+        """Test that a failed call is run again by the next call"""
+        flights = SingleFlight(ttl=60)
+
+        def fail():
+            raise ValueError('Failed on purpose')
+
+        with self.assertRaises(ValueError):
+            flights.do(1, 'key', fail)
+        self.assertEqual(flights.do(1, 'key', lambda: 'result'), 'result')
+
+
+class CoalescedReadsApiTests(TestCase):
+    """Test the coalesced reads of the recipe API"""
+
+    def setUp(self):
+        cache.clear()
+        READS.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_repeated_list_shares_queries(self):
+        """Test that a repeated list in the TTL runs no query"""
+        create_tag(self.user, name='Vegan')
+        first = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(TAGS_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_change_seen_at_once(self):
+        """Test that a change of the user isn't hidden by a shared read"""
+        self.client.get(TAGS_URL)
+        create_tag(self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Dessert'])
+
+    def test_reads_not_shared_between_users(self):
+        """Test that the same URL read by another user runs again"""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.get(url)
+        other = APIClient()
+        other.force_authenticate(create_user(email='other@example.com'))
+
+        res = other.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
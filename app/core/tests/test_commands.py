@@ -1,7 +1,20 @@
+import json
+import tempfile
+
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+
 from django.core. management import call_command
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.management.commands.importtime import parse_importtime
+from core.models import Recipe, Tag, Ingredient
+from core.tests.factories import create_user, create_recipe, create_tag, \
+    create_ingredient
 
 
 class CommandTests(TestCase):
@@ -20,3 +33,158 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def seed(self):
+        call_command(
+            'seed_data', users=2, recipes=5, tags=3, ingredients=4, links=2,
+            stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_seed_data(self):
+        """Test seeding the configured volumes of data"""
+        self.seed()
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.count(), 8)
+        self.assertEqual(Recipe.tags.through.objects.count(), 20)
+        recipe = Recipe.objects.first()
+        self.assertEqual(
+            set(recipe.tags.values_list('user_id', flat=True)),
+            {recipe.user_id}
+        )
+
+    def test_seed_data_twice_requires_clear(self):
+        """Test that seeding again only replaces the data with --clear"""
+        self.seed()
+        self.seed()
+        self.assertEqual(Recipe.objects.count(), 10)
+
+        call_command('seed_data', users=1, recipes=1, clear=True,
+                     stdout=StringIO())
+        self.assertEqual(get_user_model().objects.count(), 1)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_benchmark_api_report(self):
+        """Test that the benchmark writes a JSON report per endpoint"""
+        self.seed()
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_api', iterations=2, warmup=0,
+                         host='testserver', output=output.name,
+                         accept_encoding='gzip', stdout=StringIO())
+            report = json.load(output)
+
+        self.assertEqual(report['dataset']['recipes_for_user'], 5)
+        result = report['results']['recipe-list']
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreaterEqual(result['cpu_ms'], 0)
+        self.assertEqual(result['encoding'], 'gzip')
+        self.assertEqual(report['results']['user-token']['status'], 200)
+
+    def test_benchmark_api_writes_rolled_back(self):
+        """Test that the write endpoints are timed without keeping rows"""
+        self.seed()
+        counts = (Recipe.objects.count(), Tag.objects.count(),
+                  get_user_model().objects.count())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_api', iterations=2, warmup=0,
+                         host='testserver', output=output.name,
+                         stdout=StringIO())
+            report = json.load(output)
+
+        for name, code in (('recipe-create', 201), ('recipe-update', 200),
+                           ('recipe-partial-update', 200),
+                           ('recipe-upload-image', 200),
+                           ('tag-create', 201), ('ingredient-create', 201),
+                           ('user-create', 201)):
+            self.assertEqual(report['results'][name]['status'], code, name)
+        self.assertEqual((Recipe.objects.count(), Tag.objects.count(),
+                          get_user_model().objects.count()), counts)
+
+    def test_benchmark_api_not_throttled(self):
+        """Test that default-sized runs time the answers, not 429s"""
+        self.seed()
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_api', host='testserver',
+                         output=output.name, stdout=StringIO())
+            report = json.load(output)
+
+        for name, result in report['results'].items():
+            self.assertIn(result['status'], (200, 201), name)
+
+
+class ImportTimeCommandTests(TestCase):
+
+    def test_parse_importtime(self):
+        """Test the -X importtime report is parsed with the nesting"""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   json.decoder\n'
+            'import time:       300 |        420 | json\n'
+        )
+
+        self.assertEqual(parse_importtime(output), [
+            (120, 120, 1, 'json.decoder'),
+            (300, 420, 0, 'json'),
+        ])
+
+    def test_importtime_report(self):
+        """Test the command times another command and lists imports"""
+        out = StringIO()
+
+        call_command('importtime', 'version', repeat=1, top=3, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertIn('version: median wall time', lines[0])
+        self.assertEqual(len(lines), 5)
+
+
+class PurgeCommandTests(TestCase):
+
+    def test_purge_deleted_recipes(self):
+        """Test recipes deleted before the retention are purged"""
+        user = create_user()
+        tag = create_tag(user)
+        old = create_recipe(user, tags=[tag],
+                            deleted_at=timezone.now() - timedelta(days=2))
+        recent = create_recipe(user, tags=[tag], deleted_at=timezone.now())
+        alive = create_recipe(user, tags=[tag])
+
+        call_command('purge_deleted', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            set(Recipe.objects.values_list('id', flat=True)),
+            {recent.id, alive.id}
+        )
+        self.assertFalse(
+            Recipe.tags.through.objects.filter(recipe_id=old.id).exists())
+        self.assertTrue(Tag.objects.filter(pk=tag.pk).exists())
+
+    def test_purge_deleted_users(self):
+        """Test deleted users are purged with all their rows"""
+        user = create_user()
+        tags = [create_tag(user, name=f'Tag {i}') for i in range(3)]
+        ingredients = [create_ingredient(user, name=f'Ingredient {i}')
+                       for i in range(3)]
+        for i in range(3):
+            create_recipe(user, tags=tags, ingredients=ingredients)
+        other = create_user()
+        create_recipe(other, tags=[create_tag(other)])
+        user.soft_delete()
+        get_user_model().objects.filter(pk=user.pk).update(
+            deleted_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_deleted', batch_size=2, stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
+        self.assertEqual(Recipe.objects.get().user, other)
+        self.assertEqual(Tag.objects.get().user, other)
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
@@ -0,0 +1,165 @@
+import gzip
+import json
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import compression
+from core.coalescing import READS
+from core.tests.factories import create_recipe, create_tag, create_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def negotiate(accept_encoding):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return compression.negotiate_encoding(request)
+
+
+class NegotiationTests(TestCase):
+    """Test choosing the encoding of a response"""
+
+    def test_accepted_encodings(self):
+        """Test parsing the q-values of an Accept-Encoding header"""
+        self.assertEqual(
+            compression.accepted_encodings('gzip, br;q=0.5, *;q=0'),
+            {'gzip': 1.0, 'br': 0.5, '*': 0.0}
+        )
+
+    @patch.object(compression, 'get_brotli', return_value=object())
+    def test_brotli_preferred(self, get_brotli):
+        """Test that Brotli is chosen over gzip at the same quality"""
+        self.assertEqual(negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate('gzip, br;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('*'), 'br')
+
+    @patch.object(compression, 'get_brotli', return_value=None)
+    def test_gzip_without_brotli(self, get_brotli):
+        """Test that gzip is used when brotli isn't installed"""
+        self.assertEqual(negotiate('br, gzip'), 'gzip')
+        self.assertIsNone(negotiate('br'))
+
+    def test_identity(self):
+        """Test that nothing is chosen when nothing is accepted"""
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate('gzip;q=0, br;q=0'))
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Test compressing the responses of the API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_large_response_compressed(self):
+        """Test that a large response is compressed with gzip"""
+        for i in range(20):
+            create_recipe(self.user, title=f'Recipe number {i}')
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        recipes = json.loads(gzip.decompress(res.content))
+        self.assertEqual(len(recipes), 20)
+
+    def test_small_response_not_compressed(self):
+        """Test that responses under the threshold are sent as is"""
+        create_recipe(self.user)
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(len(res.json()), 1)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_not_compressed_when_not_accepted(self):
+        """Test that clients not accepting an encoding get identity"""
+        create_recipe(self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    @skipIf(compression.get_brotli() is None, 'brotli is not installed')
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_brotli_response(self):
+        """Test that clients accepting Brotli get Brotli"""
+        create_recipe(self.user, title='Brotli')
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        recipes = json.loads(compression.get_brotli().decompress(res.content))
+        self.assertEqual(recipes[0]['title'], 'Brotli')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0, COALESCE_READS=False)
+class CachedResponseTests(TestCase):
+    """Test the precompressed cache of the tag list and recipe details"""
+
+    def setUp(self):
+        cache.clear()
+        READS.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_hit_skips_queries_and_compression(self):
+        """Test that a cached list is sent without querying it again"""
+        create_tag(self.user, name='Vegan')
+        first = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        with patch.object(compression, 'compress') as compress, \
+                self.assertNumQueries(1):
+            second = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        compress.assert_not_called()
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(json.loads(gzip.decompress(second.content)),
+                         [{'id': first.data[0]['id'], 'name': 'Vegan'}])
+
+    def test_each_encoding_cached(self):
+        """Test that identity and gzip clients get their own body"""
+        create_tag(self.user, name='Vegan')
+        compressed = self.client.get(TAGS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        plain = self.client.get(TAGS_URL)
+
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+    def test_change_invalidates(self):
+        """Test that a change of the user is seen at once"""
+        recipe = create_recipe(self.user, title='Before')
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.get(url)
+
+        self.client.patch(url, {'title': 'After'})
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'After')
+
+    def test_errors_not_cached(self):
+        """Test that a missing recipe isn't cached"""
+        url = reverse('recipe:recipe-detail', args=[1000])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse([key for key in cache._cache if ':response:' in key])
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.test import TestCase
+
+from core.deferred import defer_until_commit
+from core.tests.utils import run_commit_hooks
+
+
+class DeferUntilCommitTests(TestCase):
+
+    def setUp(self):
+        self.flushed = []
+
+    def flush(self, items):
+        self.flushed.append(items)
+
+    def test_items_flushed_once_on_commit(self):
+        """Test that the items of a transaction are flushed together"""
+        defer_until_commit(self.flush, 'a', 1)
+        defer_until_commit(self.flush, 'b', 2)
+        defer_until_commit(self.flush, 'a', 3)
+        self.assertEqual(self.flushed, [])
+
+        run_commit_hooks()
+
+        self.assertEqual(self.flushed, [{'a': 3, 'b': 2}])
+
+    def test_batch_joined_from_savepoints(self):
+        """Test that savepoints add to the batch of the transaction"""
+        defer_until_commit(self.flush, 'kept')
+        try:
+            with transaction.atomic():
+                defer_until_commit(self.flush, 'nested')
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            defer_until_commit(self.flush, 'joined')
+
+        run_commit_hooks()
+
+        self.assertEqual(len(self.flushed), 1)
+        self.assertLessEqual({'kept', 'joined'}, set(self.flushed[0]))
+
+    def test_items_of_rolled_back_savepoint_flushed_later(self):
+        """Test that items of a rollback go with the next commit"""
+        try:
+            with transaction.atomic():
+                defer_until_commit(self.flush, 'dropped')
+                raise ValueError
+        except ValueError:
+            pass
+        defer_until_commit(self.flush, 'kept')
+
+        run_commit_hooks()
+
+        self.assertEqual(self.flushed, [{'dropped': None, 'kept': None}])
@@ -0,0 +1,220 @@
+import json
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Recipe
+from core.tests.factories import create_user, create_recipe, create_tag
+
+
+def job_url(job_id):
+    """Return the job status URL"""
+    return reverse('job-detail', args=[job_id])
+
+
+def sample_image(size):
+    """Return the content of a JPEG image of the given size"""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@jobs.task('tests.fail', max_attempts=2)
+def fail():
+    raise ValueError('Failed on purpose')
+
+
+@override_settings(JOB_QUEUES={'default': {'concurrency': 1},
+                               'images': {'concurrency': 1}})
+class JobQueueTests(TestCase):
+
+    def test_claim_and_run_job(self):
+        """Test a claimed job runs and stores its result"""
+        user = create_user()
+        job = jobs.enqueue('recipe.import_recipes', user=user,
+                           user_id=user.id, recipes=[])
+
+        claimed = jobs.claim('default', 'worker')
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        job = jobs.run(claimed)
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(json.loads(job.result), {'created': 0})
+        self.assertIsNone(jobs.claim('default', 'worker'))
+
+    def test_claim_respects_concurrency(self):
+        """Test no job is claimed while the queue runs at concurrency"""
+        jobs.enqueue('tests.fail')
+        jobs.enqueue('tests.fail')
+
+        self.assertIsNotNone(jobs.claim('default', 'worker'))
+        self.assertIsNone(jobs.claim('default', 'worker'))
+
+    def test_claim_requeues_stale_jobs(self):
+        """Test jobs abandoned by a worker are claimed again"""
+        job = jobs.enqueue('tests.fail')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+
+        claimed = jobs.claim('default', 'worker')
+
+        self.assertEqual(claimed, job)
+
+    def test_claim_fails_stale_jobs_out_of_attempts(self):
+        """Test a job abandoned on its last attempt isn't run again"""
+        job = jobs.enqueue('tests.fail')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=2,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertIsNone(jobs.claim('default', 'worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Still running', job.error)
+
+    def test_reclaimed_run_not_saved(self):
+        """Test a run outliving the timeout doesn't overwrite the next"""
+        user = create_user()
+        jobs.enqueue('recipe.import_recipes', user=user,
+                     user_id=user.id, recipes=[])
+        first = jobs.claim('default', 'first')
+        Job.objects.filter(pk=first.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+        second = jobs.claim('default', 'second')
+
+        with self.assertLogs('core.jobs', level='WARNING'):
+            jobs.run(first)
+
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.RUNNING)
+        self.assertEqual(second.locked_by, 'second')
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is retried later and then marked failed"""
+        job = jobs.enqueue('tests.fail')
+
+        job = jobs.run(jobs.claim('default', 'worker'))
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('Failed on purpose', job.error)
+        self.assertIsNone(jobs.claim('default', 'worker'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.run(jobs.claim('default', 'worker'))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_run_jobs_command(self):
+        """Test the command runs the due jobs and exits"""
+        user = create_user()
+        jobs.enqueue('recipe.import_recipes', user=user,
+                     user_id=user.id, recipes=[])
+
+        call_command('run_jobs', once=True, stdout=StringIO())
+
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+
+
+@override_settings(RECIPE_IMAGE_MAX_SIZE=100)
+class RecipeTaskTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_upload_image_queues_resize(self):
+        """Test uploading an image queues a job shrinking it"""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        image = ContentFile(sample_image((300, 150)), name='big.jpg')
+
+        res = self.client.post(url, {'image': image}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        job = Job.objects.get(pk=res.data['job'])
+        self.assertEqual(job.queue, 'images')
+        job = jobs.run(jobs.claim('images', 'worker'))
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.image.name, res.data['image'].split(
+            '/media/')[-1])
+        with recipe.image.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (100, 50))
+        recipe.image.delete(save=False)
+
+    def test_small_image_left_alone(self):
+        """Test images within the size limit are not rewritten"""
+        recipe = create_recipe(self.user)
+        recipe.image.save('small.jpg', ContentFile(sample_image((50, 50))))
+        name = recipe.image.name
+
+        job = jobs.enqueue('recipe.process_image', recipe_id=recipe.id)
+        job = jobs.run(jobs.claim('images', 'worker'))
+
+        self.assertEqual(json.loads(job.result), {'resized': False})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, name)
+        recipe.image.delete(save=False)
+
+    def test_import_recipes(self):
+        """Test importing recipes runs as a job the user can poll"""
+        tag = create_tag(self.user)
+        payload = [
+            {'title': 'Pasta', 'time_minutes': 10, 'price': '5.00',
+             'tags': [tag.id], 'ingredients': []},
+            {'title': 'Soup', 'time_minutes': 30, 'price': '3.00',
+             'tags': [], 'ingredients': []},
+        ]
+
+        res = self.client.post(reverse('recipe:recipe-import-recipes'),
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res['Location'], job_url(res.data['id']))
+        self.assertFalse(Recipe.objects.exists())
+        jobs.run(jobs.claim('default', 'worker'))
+        res = self.client.get(job_url(res.data['id']))
+        self.assertEqual(res.data['status'], Job.SUCCEEDED)
+        self.assertEqual(res.data['result'], {'created': 2})
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Recipe.objects.get(title='Pasta').tags.get(), tag)
+
+    def test_import_recipes_invalid(self):
+        """Test an invalid import creates nothing and reports errors"""
+        other_tag = create_tag(create_user())
+        payload = [{'title': 'Pasta', 'time_minutes': 10, 'price': '5.00',
+                    'tags': [other_tag.id], 'ingredients': []}]
+
+        res = self.client.post(reverse('recipe:recipe-import-recipes'),
+                               payload, format='json')
+        job = jobs.run(jobs.claim('default', 'worker'))
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(json.loads(job.result)['created'], 0)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_job_status_limited_to_user(self):
+        """Test users cannot see the jobs of others"""
+        job = jobs.enqueue('tests.fail', user=create_user())
+
+        res = self.client.get(job_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,90 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.tests.factories import create_tag
+from recipe.serializers import TagSerializer
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'metrics@mail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_per_view(self):
+        """Test that queries, render time and size are recorded per view"""
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            metrics.REQUEST_QUERIES._series[('recipe:tag-list',)]['count'],
+            1
+        )
+        self.assertIn(('recipe:tag-list',),
+                      metrics.REQUEST_RENDER_DURATION._series)
+        self.assertIn(('recipe:tag-list',), metrics.RESPONSE_SIZE._series)
+
+    def test_serialization_in_render_time(self):
+        """Test that the serialization is counted in the render time"""
+        create_tag(self.user)
+
+        def slow_representation(serializer, tag):
+            time.sleep(0.05)
+            return {'id': tag.id}
+
+        with patch.object(TagSerializer, 'to_representation',
+                          slow_representation):
+            self.client.get(TAGS_URL)
+
+        series = metrics.REQUEST_RENDER_DURATION._series[
+            ('recipe:tag-list',)]
+        self.assertGreaterEqual(series['sum'], 0.05)
+
+    def test_metrics_endpoint_prometheus_format(self):
+        """Test that the metrics are exposed in the Prometheus format"""
+        self.client.get(TAGS_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        content = res.content.decode()
+        self.assertIn('# TYPE http_request_db_queries histogram', content)
+        self.assertIn(
+            'http_request_db_queries_count{view="recipe:tag-list"} 1',
+            content
+        )
+        self.assertIn(
+            'http_request_db_queries_bucket{view="recipe:tag-list",'
+            'le="+Inf"} 1',
+            content
+        )
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_metrics_endpoint_internal_only(self):
+        """Test that the metrics endpoint is hidden from external hosts"""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_query_budget_exceeded_logged(self):
+        """Test that requests over the query budget log a warning"""
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            self.client.get(TAGS_URL)
+
+        self.assertIn('over budget', logs.output[0])
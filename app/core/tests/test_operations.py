@@ -0,0 +1,140 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection, migrations, models
+from django.db.migrations.state import ProjectState
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core.management.commands.lint_migrations import lint_migrations
+from core.models import Recipe
+from core.operations import AddIndexConcurrently, Backfill, SetNotNull, \
+    backfill
+from core.tests.factories import create_user, create_recipe
+
+
+def migration(operations, atomic=True):
+    """Return a migration of the core app with the operations"""
+    result = migrations.Migration('0100_test', 'core')
+    result.operations = operations
+    result.atomic = atomic
+    return result
+
+
+class LintMigrationsTests(TestCase):
+
+    def test_locking_operations_flagged(self):
+        """Test index builds and NOT NULL columns on tables are flagged"""
+        problems = lint_migrations([migration([
+            migrations.AddIndex(
+                'recipe', models.Index(fields=['title'], name='title_idx')),
+            migrations.AddField(
+                'recipe', 'rating', models.IntegerField(default=0)),
+            migrations.AddField(
+                'recipe', 'note', models.CharField(max_length=5, null=True)),
+            migrations.RemoveField('recipe', 'link'),
+        ])])
+
+        self.assertEqual(len(problems), 3)
+        self.assertIn('use AddIndexConcurrently', problems[0])
+        self.assertIn('NOT NULL', problems[1])
+        self.assertIn('previous release', problems[2])
+
+    def test_safe_operations_pass(self):
+        """Test concurrent indexes, backfills and new tables pass"""
+        problems = lint_migrations([
+            migration([
+                AddIndexConcurrently(
+                    'recipe',
+                    models.Index(fields=['title'], name='title_idx')),
+                Backfill('recipe', 'note', F('title')),
+                SetNotNull('recipe', 'note', models.CharField(max_length=5)),
+            ], atomic=False),
+            migration([
+                migrations.CreateModel('Rating', [
+                    ('id', models.AutoField(primary_key=True)),
+                ]),
+                migrations.AddField(
+                    'rating', 'stars', models.IntegerField(default=0)),
+            ]),
+        ])
+
+        self.assertEqual(problems, [])
+
+    def test_concurrent_operations_need_non_atomic_migration(self):
+        """Test concurrent operations in a transaction are flagged"""
+        problems = lint_migrations([migration([
+            AddIndexConcurrently(
+                'recipe', models.Index(fields=['title'], name='title_idx')),
+        ])])
+
+        self.assertIn('atomic = False', problems[0])
+
+    def test_lint_migrations_command(self):
+        """Test the command fails on the migrations that lock tables"""
+        out = StringIO()
+
+        for name in ('0012', '0013', '0015', '0016', '0017'):
+            call_command('lint_migrations', 'core', name, stdout=out)
+        with self.assertRaises(CommandError):
+            call_command('lint_migrations', 'core', '0008', stdout=out)
+
+        self.assertIn('core.0008_auto_20230317_1801: Alter field link',
+                      out.getvalue())
+
+
+class BackfillTests(TestCase):
+
+    def test_backfill_in_batches(self):
+        """Test only the NULL values are filled, every batch"""
+        user = create_user()
+        recipes = [create_recipe(user) for i in range(5)]
+        kept = timezone.now()
+        Recipe.objects.filter(pk=recipes[0].pk).update(deleted_at=kept)
+
+        updated = backfill(Recipe.objects.all(), 'deleted_at',
+                           F('created_at'), batch_size=2, pause=0)
+
+        self.assertEqual(updated, 4)
+        self.assertFalse(Recipe.objects.filter(deleted_at=None).exists())
+        self.assertEqual(Recipe.objects.get(pk=recipes[0].pk).deleted_at,
+                         kept)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs Postgres')
+class ConcurrentIndexTests(TransactionTestCase):
+
+    def test_add_index_concurrently(self):
+        """Test the index is built and dropped outside a transaction"""
+        operation = AddIndexConcurrently(
+            'recipe', models.Index(fields=['title'], name='recipe_title_idx'))
+        project_state = ProjectState.from_apps(Recipe._meta.apps)
+        new_state = project_state.clone()
+        operation.state_forwards('core', new_state)
+
+        with connection.schema_editor(atomic=False) as editor:
+            operation.database_forwards(
+                'core', editor, project_state, new_state)
+        constraints = connection.introspection.get_constraints(
+            connection.cursor(), Recipe._meta.db_table)
+        self.assertIn('recipe_title_idx', constraints)
+
+        with connection.schema_editor(atomic=False) as editor:
+            operation.database_backwards(
+                'core', editor, new_state, project_state)
+        constraints = connection.introspection.get_constraints(
+            connection.cursor(), Recipe._meta.db_table)
+        self.assertNotIn('recipe_title_idx', constraints)
+
+    def test_add_index_concurrently_in_transaction(self):
+        """Test running in an atomic migration is refused"""
+        operation = AddIndexConcurrently(
+            'recipe', models.Index(fields=['title'], name='recipe_title_idx'))
+        project_state = ProjectState.from_apps(Recipe._meta.apps)
+
+        with self.assertRaises(ValueError):
+            with connection.schema_editor(atomic=True) as editor:
+                operation.database_forwards(
+                    'core', editor, project_state, project_state)
@@ -0,0 +1,90 @@
+import time
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import PROFILE
+from core.profiling import StackAggregator, StackSampler, OVERFLOW_STACK
+
+PROFILE_URL = reverse('profile')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class StackSamplerTests(TestCase):
+
+    def test_sampler_collects_current_thread(self):
+        """Test that the sampler records the stacks of the thread"""
+        aggregator = StackAggregator(max_stacks=100)
+        with StackSampler(aggregator, interval=0.001):
+            time.sleep(0.05)
+
+        collapsed = aggregator.collapsed()
+        self.assertIn(
+            'test_profiling:test_sampler_collects_current_thread',
+            collapsed
+        )
+
+    def test_aggregator_bounded(self):
+        """Test that new stacks are folded once the limit is reached"""
+        aggregator = StackAggregator(max_stacks=2)
+        aggregator.add('a;b')
+        aggregator.add('a;c')
+        aggregator.add('a;d')
+        aggregator.add('a;b')
+
+        self.assertEqual(
+            aggregator.collapsed(),
+            f'{OVERFLOW_STACK} 1\na;b 2\na;c 1\n'
+        )
+
+
+class SamplingProfilerMiddlewareTests(TestCase):
+
+    def setUp(self):
+        PROFILE.reset()
+        self.user = get_user_model().objects.create_user(
+            'profile@mail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_selected_view_sampled(self):
+        """Test that requests to selected views are sampled"""
+        with patch('core.middleware.StackSampler') as sampler:
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(sampler.call_count, 1)
+        sampler.return_value.start.return_value.stop.assert_called_once()
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_VIEWS=[])
+    def test_other_views_not_sampled(self):
+        """Test that views that are not selected are never sampled"""
+        with patch('core.middleware.StackSampler') as sampler:
+            self.client.get(TAGS_URL)
+
+        sampler.assert_not_called()
+
+    def test_profile_download_staff_only(self):
+        """Test that the profile can only be downloaded by staff"""
+        client = Client()
+        client.force_login(self.user)
+        res = client.get(PROFILE_URL)
+        self.assertEqual(res.status_code, 302)
+
+        admin = get_user_model().objects.create_superuser(
+            'admin@mail.com',
+            'testpass'
+        )
+        PROFILE.add('recipe.views:list')
+        client.force_login(admin)
+        res = client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'recipe.views:list 1\n')
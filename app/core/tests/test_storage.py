@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from core.storage import ContentAddressedStorage, is_content_addressed
+from core.tests.factories import create_recipe, create_user
+from recipe.serializers import RecipeImageSerializer
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_name_from_content_hash(self):
+        """Test that files are named after the hash of their content"""
+        name = self.storage.save('uploads/recipe/a.JPG', ContentFile(b'abc'))
+
+        digest = ('ba7816bf8f01cfea414140de5dae2223'
+                  'b00361a396177a9cb410ff61f20015ad')
+        self.assertEqual(name, f'uploads/recipe/ba/{digest}.jpg')
+        self.assertTrue(is_content_addressed(name))
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'abc')
+
+    def test_same_content_deduplicated(self):
+        """Test that uploading the same content reuses the file"""
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+        third = self.storage.save('uploads/recipe/c.jpg', ContentFile(b'y'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(self.storage.path(first)))), 1)
+
+
+class RecipeImageReferenceTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_replaced_image_left_to_gc(self):
+        """Test that a replaced image is only deleted by the collector"""
+        recipe = create_recipe(user=self.user)
+        recipe.image.save('a.jpg', ContentFile(b'old'))
+        old = recipe.image.name
+
+        serializer = RecipeImageSerializer(recipe, data={})
+        serializer.is_valid()
+        serializer.save(image=ContentFile(b'new', name='b.jpg'))
+        self.assertTrue(default_storage.exists(old))
+
+        past = os.path.getmtime(default_storage.path(old)) - 7200
+        os.utime(default_storage.path(old), (past, past))
+        call_command('gc_recipe_images', grace_hours=1, stdout=StringIO())
+        self.assertFalse(default_storage.exists(old))
+        recipe.image.delete()
+
+    def test_gc_deletes_unreferenced_files(self):
+        """Test that the collector only deletes unreferenced old files"""
+        recipe = create_recipe(user=self.user)
+        recipe.image.save('kept.jpg', ContentFile(b'kept'))
+        orphan = default_storage.save('uploads/recipe/o.jpg',
+                                      ContentFile(b'orphan'))
+        recent = default_storage.save('uploads/recipe/r.jpg',
+                                      ContentFile(b'recent'))
+        past = os.path.getmtime(default_storage.path(orphan)) - 7200
+        os.utime(default_storage.path(orphan), (past, past))
+
+        call_command('gc_recipe_images', grace_hours=1, stdout=StringIO())
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(recent))
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        default_storage.delete(recent)
+        recipe.image.delete()
+
+    def test_gc_only_collects_recipe_images(self):
+        """Test that the collector leaves the other files alone"""
+        names = [
+            default_storage.save('exports/report.csv', ContentFile(b'csv')),
+            'uploads/recipe/legacy.jpg',
+        ]
+        with open(default_storage.path(names[1]), 'wb') as f:
+            f.write(b'legacy')
+        for name in names:
+            past = os.path.getmtime(default_storage.path(name)) - 7200
+            os.utime(default_storage.path(name), (past, past))
+
+        call_command('gc_recipe_images', grace_hours=1, stdout=StringIO())
+
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+            default_storage.delete(name)
+
+
+class ImmutableCacheHeaderTests(TestCase):
+
+    def test_content_addressed_image_immutable(self):
+        """Test that content addressed images are cached for good"""
+        user = create_user()
+        recipe = create_recipe(user=user)
+        recipe.image.save('a.jpg', ContentFile(b'immutable'))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(recipe.image.url)
+
+        self.assertIn('immutable', res['Cache-Control'])
+        recipe.image.delete()
+
+    def test_etag_unchanged_by_upload_of_same_content(self):
+        """Test that uploading the content again keeps the ETag"""
+        user = create_user()
+        recipe = create_recipe(user=user)
+        recipe.image.save('a.jpg', ContentFile(b'same'))
+        client = APIClient()
+        client.force_authenticate(user)
+        first = client.get(recipe.image.url)
+        past = os.path.getmtime(recipe.image.path) - 7200
+        os.utime(recipe.image.path, (past, past))
+
+        default_storage.save('uploads/recipe/b.jpg', ContentFile(b'same'))
+        second = client.get(recipe.image.url)
+
+        self.assertEqual(first['ETag'], second['ETag'])
+        recipe.image.delete()
@@ -0,0 +1,191 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.middleware import QueryStats
+from core.tests.factories import create_user
+from core.throttling import AdaptiveConcurrencyLimit, EndpointRateThrottle
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        'DEFAULT_THROTTLE_CLASSES': (
+            'core.throttling.EndpointRateThrottle',
+        ),
+        'DEFAULT_THROTTLE_RATES': dict(
+            {'endpoint': '300/min', 'login': '30/min', 'login_email': '5/min'},
+            **rates
+        ),
+    })
+
+
+class EndpointRateThrottleTests(TestCase):
+    """Test the token buckets of the API endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    @throttle_rates(endpoint='2/min')
+    def test_burst_then_rejected(self):
+        """Test that requests over the bucket get 429 and a Retry-After"""
+        for _ in range(2):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    @throttle_rates(endpoint='1/min')
+    def test_buckets_per_endpoint_and_user(self):
+        """Test that each user has a bucket for each endpoint"""
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(self.client.get(TAGS_URL).status_code,
+                         status.HTTP_200_OK)
+        other = APIClient()
+        other.force_authenticate(create_user(email='other@example.com'))
+        self.assertEqual(other.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(endpoint='2/min')
+    def test_tokens_refill_over_time(self):
+        """Test that a token is back after its share of the period"""
+        with patch.object(EndpointRateThrottle, 'timer') as timer:
+            timer.return_value = 1000.0
+            self.client.get(RECIPES_URL)
+            self.client.get(RECIPES_URL)
+            timer.return_value = 1029.0
+            rejected = self.client.get(RECIPES_URL)
+            timer.return_value = 1031.0
+            allowed = self.client.get(RECIPES_URL)
+
+        self.assertEqual(rejected.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+
+    @override_settings(COALESCE_READS=False)
+    def test_throttle_runs_no_queries(self):
+        """Test that the throttle doesn't add queries to the request"""
+        self.client.get(TAGS_URL)
+
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(stats.count, 1)
+
+
+class LoadSheddingTests(TestCase):
+    """Test the adaptive concurrency limit and the middleware using it"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+
+    def run_window(self, limit, samples):
+        """Release the (latency, query_time, view) samples, then a window"""
+        for latency, query_time, view in samples:
+            limit.acquire()
+            limit.release(latency, query_time, view)
+        limit.timer = lambda: limit._window_start + limit.window
+        limit.acquire()
+        limit.release(*samples[-1])
+
+    def test_limit_decreases_on_slow_requests(self):
+        """Test that requests slower than usual lower the limit"""
+        limit = AdaptiveConcurrencyLimit(2, 10, 1.0, min_samples=5)
+        self.run_window(limit, [(0.1, 0.01, 'list')] * 20)
+        self.assertEqual(limit.limit, 10)
+
+        self.run_window(limit, [(0.5, 0.05, 'list')] * 5)
+        self.assertLess(limit.limit, 10)
+
+        for _ in range(10):
+            self.run_window(limit, [(5.0, 0.5, 'list')] * 5)
+        self.assertLess(limit.limit, 7)
+
+    def test_limit_cut_once_per_window(self):
+        """Test that slow requests within a window cut the limit once"""
+        limit = AdaptiveConcurrencyLimit(2, 10, 1.0, min_samples=5)
+        self.run_window(limit, [(0.1, None, 'list')] * 5)
+
+        limit.timer = lambda: limit._window_start
+        for _ in range(50):
+            limit.acquire()
+            limit.release(1.0, None, 'list')
+
+        self.assertEqual(limit.limit, 10)
+
+    def test_slow_views_keep_limit(self):
+        """Test that views slow by nature don't lower the limit"""
+        limit = AdaptiveConcurrencyLimit(2, 64, 1.0, min_samples=5)
+        samples = [(0.05, 0.001, 'list')] * 9 + [(2.0, 0.001, 'upload')]
+
+        for _ in range(100):
+            self.run_window(limit, samples)
+
+        self.assertEqual(limit.limit, 64)
+
+    def test_limit_recovers_on_fast_requests(self):
+        """Test that requests back at their usual speed raise the limit"""
+        limit = AdaptiveConcurrencyLimit(2, 10, 1.0, min_samples=5)
+        limit.limit = 2.0
+
+        for _ in range(50):
+            self.run_window(limit, [(0.01, 0.001, 'list')] * 5)
+
+        self.assertEqual(limit.limit, 10)
+
+    def test_requests_over_limit_rejected(self):
+        """Test that requests over the limit are rejected at once"""
+        limit = AdaptiveConcurrencyLimit(1, 2, 1.0)
+        self.assertTrue(limit.acquire())
+        self.assertTrue(limit.acquire())
+        self.assertFalse(limit.acquire())
+
+        with patch.object(middleware, 'CONCURRENCY_LIMIT', limit):
+            stats = QueryStats()
+            with connection.execute_wrapper(stats):
+                res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(stats.count, 0)
+
+    def test_exempt_paths_not_shed(self):
+        """Test that the metrics are served while shedding"""
+        limit = AdaptiveConcurrencyLimit(0, 0, 1.0)
+
+        with patch.object(middleware, 'CONCURRENCY_LIMIT', limit):
+            res = self.client.get(reverse('metrics'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_finished_request_released(self):
+        """Test that a request gives back its slot with its timings"""
+        limit = AdaptiveConcurrencyLimit(1, 4, 1.0)
+
+        with patch.object(middleware, 'CONCURRENCY_LIMIT', limit):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(limit.in_flight, 0)
@@ -0,0 +1,9 @@
+from django.db import transaction
+
+
+def run_commit_hooks(using=None):
+    """Run the on_commit callbacks the rollback of TestCase would drop"""
+    connection = transaction.get_connection(using)
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, func in callbacks:
+        func()
@@ -0,0 +1,152 @@
+import threading
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Return the (requests, seconds) of a rate such as '120/min'"""
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket kept in the cache, one bucket per cache key
+
+    A rate of N/period holds up to N tokens and refills them evenly over
+    the period, so bursts of N are allowed but not a sustained excess.
+    A rate of None allows every request, as in DRF. The bucket is a
+    (tokens, timestamp) pair: reading and writing it costs the same
+    whatever the rate. With a shared cache two processes can both take the
+    last token, the limit is approximate by that much.
+    """
+    cache = default_cache
+    timer = time.time
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+    scope = None
+
+    def __init__(self):
+        try:
+            rate = api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'No default throttle rate set for {self.scope!r} scope')
+        self.rate = rate
+        if rate is not None:
+            self.capacity, self.period = parse_rate(rate)
+        self.wait_time = None
+
+    def get_cache_key(self, request, view):
+        """Return the key of the bucket of the request, None to allow it"""
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        now = self.timer()
+        tokens, last = self.cache.get(key, (self.capacity, now))
+        refill = self.capacity / self.period
+        tokens = min(self.capacity, tokens + (now - last) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_time = (1 - tokens) / refill
+        self.cache.set(key, (tokens, now), self.period)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class EndpointRateThrottle(TokenBucketThrottle):
+    """Limit the requests of a user, or an address, to each endpoint"""
+    scope = 'endpoint'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        action = getattr(view, 'action', None) or request.method.lower()
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': f'{ident}_{view.__class__.__name__}.{action}'
+        }
+
+
+class AdaptiveConcurrencyLimit:
+    """Limit of concurrent requests adjusted to their latency
+
+    Each view, and the average query time, has its own baseline, its usual
+    latency: a moving average falling quickly with faster requests and
+    rising slowly with slower ones. Once per window of at least
+    min_samples requests, the limit is scaled by the gradient between the
+    baselines and the latencies of the window, within [0.5, 1], and gains
+    sqrt(limit) of headroom, smoothed. Views slow by nature don't lower it,
+    a window slower than tolerance times the baselines does. Requests over
+    the limit should be rejected at once.
+    """
+    timer = time.monotonic
+    baseline_fall = 0.2
+    baseline_rise = 0.01
+    smoothing = 0.2
+
+    def __init__(self, minimum, maximum, window, tolerance=1.5,
+                 min_samples=10):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.baselines = {}
+        self._ratios = []
+        self._window_start = self.timer()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Count a new request, return False when it should be shed"""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def _sample(self, key, value):
+        baseline = self.baselines.get(key, value)
+        self._ratios.append(baseline / value if value > 0 else 1.0)
+        weight = self.baseline_fall if value < baseline else \
+            self.baseline_rise
+        self.baselines[key] = baseline + (value - baseline) * weight
+
+    def release(self, latency, query_time=None, view=None):
+        """Count a finished request and adjust the limit once per window"""
+        with self._lock:
+            self.in_flight -= 1
+            self._sample(view, latency)
+            if query_time is not None:
+                self._sample('<queries>', query_time)
+
+            now = self.timer()
+            if now - self._window_start < self.window or \
+                    len(self._ratios) < self.min_samples:
+                return
+            ratio = sum(self._ratios) / len(self._ratios)
+            gradient = max(0.5, min(1.0, ratio * self.tolerance))
+            target = self.limit * gradient + self.limit ** 0.5
+            limit = self.limit + (target - self.limit) * self.smoothing
+            self.limit = max(self.minimum, min(self.maximum, limit))
+            self._ratios = []
+            self._window_start = now
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_http_methods
+from rest_framework import generics, permissions
+
+from core.metrics import REGISTRY
+from core.middleware import PROFILE
+from core.models import Job
+from core.serializers import JobSerializer
+from user.authentication import SignedTokenAuthentication
+
+
+def metrics(request):
+    """Expose the in-process request metrics in the Prometheus format"""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(
+        REGISTRY.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@staff_member_required
+@require_http_methods(['GET', 'DELETE'])
+def profile(request):
+    """Download the sampled stacks, or discard them with DELETE"""
+    if request.method == 'DELETE':
+        PROFILE.reset()
+        return HttpResponse(status=204)
+    response = HttpResponse(PROFILE.collapsed(), content_type='text/plain')
+    response['Content-Disposition'] = 'attachment; filename="profile.folded"'
+    return response
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """Return the status of a background job of the user"""
+    serializer_class = JobSerializer
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
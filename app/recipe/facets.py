@@ -0,0 +1,90 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from core.models import Recipe
+from recipe.filter_index import current_version
+
+
+def _facet_sql(field, recipes_sql):
+    """Return the SQL counting the filtered recipes of each related row
+
+    Rows without a matching recipe are kept with a count of zero.
+    """
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through._meta.db_table
+    related = m2m.related_model._meta.db_table
+    target = m2m.m2m_reverse_name()
+    return (
+        f"SELECT '{field}', r.id, r.name, COUNT(l.recipe_id) "
+        f'FROM {related} r LEFT JOIN {through} l '
+        f'ON l.{target} = r.id AND l.recipe_id IN ({recipes_sql}) '
+        f'WHERE r.user_id = %s GROUP BY r.id, r.name'
+    )
+
+
+def _zero_counts(user):
+    """Return every tag and ingredient of the user with a count of zero"""
+    result = {'count': 0}
+    for field in ('tags', 'ingredients'):
+        related = Recipe._meta.get_field(field).related_model
+        result[field] = [
+            {'id': pk, 'name': name, 'count': 0}
+            for pk, name in related.objects.filter(user=user)
+            .order_by('name', 'id').values_list('id', 'name')
+        ]
+    return result
+
+
+def facet_counts(user, recipes):
+    """Count the recipes by tag and by ingredient in one query
+
+    recipes is the filtered queryset of the user's live recipes.
+    """
+    recipes = recipes.order_by().values('pk')
+    try:
+        recipes_sql, recipes_params = recipes.query.sql_with_params()
+    except EmptyResultSet:
+        # Filters known to match nothing, such as pk__in of an empty set
+        return _zero_counts(user)
+    sql = ' UNION ALL '.join((
+        f"SELECT 'count', NULL, NULL, COUNT(*) FROM ({recipes_sql}) f",
+        _facet_sql('tags', recipes_sql),
+        _facet_sql('ingredients', recipes_sql),
+    ))
+    params = [*recipes_params, *recipes_params, user.pk,
+              *recipes_params, user.pk]
+
+    result = {'count': 0, 'tags': [], 'ingredients': []}
+    with connections[recipes.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        for kind, pk, name, count in cursor.fetchall():
+            if kind == 'count':
+                result['count'] = count
+            else:
+                result[kind].append({'id': pk, 'name': name, 'count': count})
+    for kind in ('tags', 'ingredients'):
+        result[kind].sort(key=lambda facet: (facet['name'], facet['id']))
+    return result
+
+
+def cached_facet_counts(user, get_recipes, params):
+    """Return facet_counts() cached until the user changes anything
+
+    The key holds the change sequence of the user, so any change of a
+    recipe, tag or ingredient moves every process to new entries.
+    get_recipes is only called on a miss.
+    """
+    filters = '&'.join(f'{key}={params[key]}' for key in sorted(params))
+    key = 'recipe_facets:{}:{}:{}'.format(
+        user.pk, current_version(user),
+        hashlib.md5(filters.encode()).hexdigest()
+    )
+    result = cache.get(key)
+    if result is None:
+        result = facet_counts(user, get_recipes())
+        cache.set(key, result, settings.RECIPE_FACETS_CACHE_TIMEOUT)
+    return result
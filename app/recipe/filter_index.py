@@ -0,0 +1,114 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core.models import Recipe
+
+
+def current_version(user):
+    """Return the change sequence of the user, bumped by every change
+
+    Recipe saves and their m2m_changed signals increment it, so an index
+    built at this version is current while it does not move.
+    """
+    return get_user_model().objects.filter(pk=user.pk) \
+        .values_list('change_seq', flat=True).get()
+
+
+class RecipeFilterIndex:
+    """Live recipe ids of a user by tag and by ingredient"""
+
+    def __init__(self, version, by_tag, by_ingredient):
+        self.version = version
+        self.by_tag = by_tag
+        self.by_ingredient = by_ingredient
+        self.size = sum(len(ids) for ids in by_tag.values()) + \
+            sum(len(ids) for ids in by_ingredient.values())
+
+    @classmethod
+    def build(cls, user, version):
+        """Load the links of the live recipes of the user, two queries"""
+        recipes = Recipe.objects.alive().filter(user=user)
+        maps = []
+        for field in ('tags', 'ingredients'):
+            through = Recipe._meta.get_field(field).remote_field.through
+            target = Recipe._meta.get_field(field).m2m_reverse_name()
+            rows = through.objects.filter(recipe__in=recipes) \
+                .order_by(target, 'recipe_id') \
+                .values_list(target, 'recipe_id')
+            ids_by_related = {}
+            for related_id, recipe_id in rows:
+                ids_by_related.setdefault(related_id, array('I')) \
+                    .append(recipe_id)
+            maps.append(ids_by_related)
+        return cls(version, *maps)
+
+    @staticmethod
+    def _combine(ids_by_related, related_ids, match_all):
+        sets = [set(ids_by_related.get(pk, ())) for pk in related_ids]
+        if match_all:
+            return set.intersection(*sets)
+        return set.union(*sets)
+
+    def filter(self, tag_ids=(), ingredient_ids=(), match_all=False):
+        """Return the ids of the recipes with any (or all) of the ids
+
+        The tag and ingredient conditions are combined with AND.
+        """
+        result = None
+        for ids_by_related, related_ids in ((self.by_tag, tag_ids),
+                                            (self.by_ingredient,
+                                             ingredient_ids)):
+            if related_ids:
+                ids = self._combine(ids_by_related, related_ids, match_all)
+                result = ids if result is None else result & ids
+        return result
+
+
+class RecipeFilterIndexCache:
+    """LRU of the filter indexes of the users, bounded in recipe ids"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user):
+        """Return a current index of the user, building it when needed"""
+        version = current_version(user)
+        with self._lock:
+            index = self._indexes.get(user.pk)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(user.pk)
+                return index
+
+        index = RecipeFilterIndex.build(user, version)
+        with self._lock:
+            previous = self._indexes.pop(user.pk, None)
+            if previous is not None:
+                self.size -= previous.size
+            if index.size <= self.max_size:
+                self._indexes[user.pk] = index
+                self.size += index.size
+                while self.size > self.max_size:
+                    _, evicted = self._indexes.popitem(last=False)
+                    self.size -= evicted.size
+        return index
+
+    def discard(self, user_id):
+        with self._lock:
+            index = self._indexes.pop(user_id, None)
+            if index is not None:
+                self.size -= index.size
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self.size = 0
+
+
+INDEXES = RecipeFilterIndexCache(settings.RECIPE_FILTER_INDEX_MAX_SIZE)
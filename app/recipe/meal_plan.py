@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+
+from core.models import Recipe
+
+
+SERVINGS = DecimalField(max_digits=7, decimal_places=2)
+PRICE = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _format(amount):
+    """Return the amount as a string with two decimals, like the API"""
+    return str(Decimal(amount or 0).quantize(Decimal('0.01')))
+
+
+def _multiplier(field, servings_by_id):
+    """Return the servings of the recipe in field as an SQL expression"""
+    return Case(
+        *(When(**{field: pk}, then=Value(servings))
+          for pk, servings in servings_by_id.items()),
+        default=Value(Decimal(0)),
+        output_field=SERVINGS
+    )
+
+
+def build_meal_plan(recipes, servings_by_id):
+    """Return the totals and the shopping list of the planned recipes
+
+    Each runs as one aggregate query, the ingredients are grouped over the
+    recipe ingredient table with the servings of each recipe as weight.
+    """
+    recipes = recipes.filter(pk__in=list(servings_by_id))
+    totals = recipes.aggregate(
+        recipes=Count('id'),
+        price=Sum(F('price') * _multiplier('id', servings_by_id),
+                  output_field=PRICE),
+        time_minutes=Sum('time_minutes')
+    )
+    through = Recipe.ingredients.through
+    ingredients = through.objects \
+        .filter(recipe__in=recipes) \
+        .values('ingredient_id', 'ingredient__name') \
+        .annotate(recipes=Count('recipe_id'),
+                  servings=Sum(_multiplier('recipe_id', servings_by_id))) \
+        .order_by('ingredient__name', 'ingredient_id')
+
+    return {
+        'recipes': totals['recipes'],
+        'total_price': _format(totals['price']),
+        'total_time_minutes': totals['time_minutes'] or 0,
+        'ingredients': [
+            {
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'recipes': row['recipes'],
+                'servings': _format(row['servings']),
+            }
+            for row in ingredients
+        ],
+    }
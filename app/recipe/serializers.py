@@ -1,6 +1,89 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, release_recipe_image
+from core.storage import is_content_addressed
+from recipe.fields import UserOwnedPrimaryKeyRelatedField
+
+
+RELATED_FIELDS = ('ingredients', 'tags')
+
+
+def set_related(field_name, related_by_recipe):
+    """Replace the related objects of many recipes at once
+
+    The current links of every recipe are read with one query, then the
+    difference is applied with one bulk delete and one bulk insert. The
+    m2m_changed signals are sent once per recipe with the changed keys.
+    """
+    if not related_by_recipe:
+        return
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+
+    recipes = {recipe.pk: recipe for recipe in related_by_recipe}
+    wanted = {
+        recipe.pk: {obj.pk for obj in related}
+        for recipe, related in related_by_recipe.items()
+    }
+    current = {pk: {} for pk in recipes}
+    rows = through.objects.filter(**{f'{source}__in': list(recipes)}) \
+        .values_list('id', source, target)
+    for row_id, recipe_id, related_id in rows:
+        current[recipe_id][related_id] = row_id
+
+    removed = {pk: set(current[pk]) - wanted[pk] for pk in recipes}
+    added = {pk: wanted[pk] - set(current[pk]) for pk in recipes}
+
+    def send(action, changes):
+        for pk, pk_set in changes.items():
+            if pk_set:
+                m2m_changed.send(
+                    sender=through, action=action, instance=recipes[pk],
+                    reverse=False, model=field.related_model, pk_set=pk_set,
+                    using=through.objects.db
+                )
+
+    if any(removed.values()):
+        send('pre_remove', removed)
+        through.objects.filter(id__in=[
+            current[pk][related_id]
+            for pk, related_ids in removed.items()
+            for related_id in related_ids
+        ]).delete()
+        send('post_remove', removed)
+    if any(added.values()):
+        send('pre_add', added)
+        through.objects.bulk_create([
+            through(**{source: pk, target: related_id})
+            for pk, related_ids in added.items()
+            for related_id in related_ids
+        ])
+        send('post_add', added)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Update many recipes with bulk writes for their relations"""
+
+    def update(self, instances, validated_data):
+        related = {name: {} for name in RELATED_FIELDS}
+        for recipe, attrs in zip(instances, validated_data):
+            for name in RELATED_FIELDS:
+                if name in attrs:
+                    related[name][recipe] = attrs.pop(name)
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            recipe.save()
+        for name, related_by_recipe in related.items():
+            set_related(name, related_by_recipe)
+        return instances
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -24,11 +107,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 class RecipeSerialize(serializers.ModelSerializer):
     """Serialize a recipe"""
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserOwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserOwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -38,6 +121,31 @@ class RecipeSerialize(serializers.ModelSerializer):
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
                   'price', 'link')
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def _pop_related(self, validated_data):
+        return {
+            name: validated_data.pop(name)
+            for name in RELATED_FIELDS if name in validated_data
+        }
+
+    def create(self, validated_data):
+        """Create a recipe, linking its relations in bulk"""
+        related = self._pop_related(validated_data)
+        with transaction.atomic():
+            recipe = super().create(validated_data)
+            for name, objs in related.items():
+                set_related(name, {recipe: objs})
+        return recipe
+
+    def update(self, instance, validated_data):
+        """Update a recipe, applying only the changes to its relations"""
+        related = self._pop_related(validated_data)
+        with transaction.atomic():
+            recipe = super().update(instance, validated_data)
+            for name, objs in related.items():
+                set_related(name, {recipe: objs})
+        return recipe
 
 
 class RecipeDetailSerialize(RecipeSerialize):
@@ -53,3 +161,116 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'image')
         read_only_fields = ('id',)
+
+    def update(self, instance, validated_data):
+        """Replace the image, deleting the previous file if unused"""
+        previous = instance.image.name
+        recipe = super().update(instance, validated_data)
+        if previous != recipe.image.name:
+            release_recipe_image(previous)
+        return recipe
+
+
+class RecipeImageUploadUrlSerializer(serializers.Serializer):
+    """Serializer asking for a URL to upload an image directly"""
+    sha256 = serializers.RegexField(r'^[0-9a-f]{64}$')
+    extension = serializers.ChoiceField(
+        choices=('jpg', 'jpeg', 'png', 'gif', 'webp'))
+
+
+class RecipeImageUploadCompleteSerializer(serializers.Serializer):
+    """Serializer attaching a directly uploaded image to a recipe"""
+    image = serializers.CharField()
+
+    def validate_image(self, value):
+        """Check that the image was uploaded to the storage"""
+        if not value.startswith('uploads/recipe/') or \
+                not is_content_addressed(value) or \
+                not default_storage.exists(value):
+            raise serializers.ValidationError(
+                'No image was uploaded with this name.')
+        return value
+
+    def update(self, instance, validated_data):
+        previous = instance.image.name
+        instance.image.name = validated_data['image']
+        instance.save(update_fields=['image'])
+        if previous != instance.image.name:
+            release_recipe_image(previous)
+        return instance
+
+
+class MealPlanItemListSerializer(serializers.ListSerializer):
+    """Recipes of a meal plan, counted before their items are validated"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and \
+                len(data) > settings.MEAL_PLAN_MAX_RECIPES:
+            raise serializers.ValidationError(
+                'Ensure this field has no more than '
+                f'{settings.MEAL_PLAN_MAX_RECIPES} elements.')
+        return super().to_internal_value(data)
+
+
+class MealPlanItemSerializer(serializers.Serializer):
+    """Serializer for a recipe of a meal plan"""
+    id = serializers.IntegerField()
+    servings = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal('0.01'),
+        default=Decimal(1)
+    )
+
+    class Meta:
+        list_serializer_class = MealPlanItemListSerializer
+
+
+class MealPlanSerializer(serializers.Serializer):
+    """Serializer for the recipes to combine into a meal plan"""
+    recipes = MealPlanItemSerializer(many=True, allow_empty=False)
+
+    def validate_recipes(self, value):
+        """Add up the servings of recipes listed more than once"""
+        servings_by_id = {}
+        for item in value:
+            servings_by_id[item['id']] = \
+                servings_by_id.get(item['id'], 0) + item['servings']
+        return servings_by_id
+
+
+class SimilarRecipeSerializer(serializers.Serializer):
+    """Serializer for a recipe and its similarity to another"""
+    recipe = RecipeSerialize()
+    similarity = serializers.FloatField()
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Serializer for the price, time and ordering params of the list"""
+    ORDERING_FIELDS = {
+        'price': 'price',
+        'time': 'time_minutes',
+        'title': 'title',
+    }
+
+    price_min = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    price_max = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    time_max = serializers.IntegerField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=[prefix + name for name in ORDERING_FIELDS
+                 for prefix in ('', '-')],
+        required=False
+    )
+
+    def validate_ordering(self, value):
+        """Return the model field to order by"""
+        descending = value.startswith('-')
+        field = self.ORDERING_FIELDS[value.lstrip('-')]
+        return f'-{field}' if descending else field
+
+    def validate(self, attrs):
+        if 'price_min' in attrs and 'price_max' in attrs and \
+                attrs['price_min'] > attrs['price_max']:
+            raise serializers.ValidationError(
+                'price_min must not be greater than price_max.')
+        return attrs
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.coalescing import READS
+from core.models import Ingredient, Recipe, Tag, release_recipe_image
+from recipe.filter_index import INDEXES
+from recipe.similarity import index_recipes_on_commit
+from recipe.sync import record_change
+
+
+SYNC_NAMES = {Recipe: 'recipes', Tag: 'tags', Ingredient: 'ingredients'}
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_image(sender, instance, **kwargs):
+    """Delete the image of a deleted recipe once nothing uses it"""
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: release_recipe_image(name))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def log_saved(sender, instance, raw=False, **kwargs):
+    """Log the change for the sync endpoint, soft deletes as tombstones"""
+    if not raw:
+        deleted = getattr(instance, 'deleted_at', None) is not None
+        record_change(instance.user_id, SYNC_NAMES[sender], instance.pk,
+                      deleted=deleted)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def log_deleted(sender, instance, **kwargs):
+    """Log a tombstone for the sync endpoint"""
+    record_change(instance.user_id, SYNC_NAMES[sender], instance.pk,
+                  deleted=True)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def log_related_changed(sender, instance, action, reverse, **kwargs):
+    """Log the recipes whose tags or ingredients changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        record_change(instance.user_id, 'recipes', instance.pk,
+                      deleted=instance.deleted_at is not None)
+    elif kwargs['pk_set']:
+        for recipe in Recipe.objects.filter(pk__in=kwargs['pk_set']):
+            record_change(recipe.user_id, 'recipes', recipe.pk,
+                          deleted=recipe.deleted_at is not None)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_reads(sender, instance, **kwargs):
+    """Stop sharing the reads of the user, again once the change commits"""
+    user_id = instance.user_id
+    READS.invalidate(user_id)
+    transaction.on_commit(lambda: READS.invalidate(user_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def reindex_related_changed(sender, instance, action, reverse, **kwargs):
+    """Index the recipes whose links changed once the transaction commits"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_recipes_on_commit([instance.pk])
+    elif kwargs['pk_set']:
+        index_recipes_on_commit(kwargs['pk_set'])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def drop_user_caches(sender, instance, created, **kwargs):
+    """Forget any index or read left by a user whose id was reused"""
+    if created:
+        INDEXES.discard(instance.pk)
+        READS.invalidate(instance.pk)
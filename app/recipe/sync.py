@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from core.models import ChangeLog, Ingredient, Recipe, Tag
+
+
+# Sync name of each model with how its rows are loaded and serialized
+MODELS = {
+    'recipes': (
+        Recipe.objects.alive().prefetch_related('tags', 'ingredients'),
+        'RecipeSerialize'
+    ),
+    'tags': (Tag.objects.all(), 'TagSerializer'),
+    'ingredients': (Ingredient.objects.all(), 'IngredientSerializer'),
+}
+
+
+def _serializer_class(name):
+    """Import the serializers on first use, the signals load this module"""
+    from recipe import serializers
+    return getattr(serializers, name)
+
+
+def record_change(user_id, model, object_id, deleted=False):
+    """Log a change of a row of the user under the next sequence number
+
+    Only the last change of a row is kept, so the log grows with the rows
+    touched and not with the number of writes.
+    """
+    with transaction.atomic():
+        users = get_user_model().objects.filter(pk=user_id)
+        # NULL on the rows created by the release before 0017
+        users.update(change_seq=Coalesce(F('change_seq'), 0) + 1)
+        seq = users.values_list('change_seq', flat=True).get()
+        updated = ChangeLog.objects.filter(model=model, object_id=object_id) \
+            .update(user_id=user_id, seq=seq, deleted=deleted)
+        if not updated:
+            ChangeLog.objects.create(user_id=user_id, seq=seq, model=model,
+                                     object_id=object_id, deleted=deleted)
+
+
+def _serialize(user, ids_by_model):
+    """Return the serialized rows by model and the ids no longer found"""
+    data = {}
+    missing = {}
+    for model, (queryset, serializer_name) in MODELS.items():
+        ids = ids_by_model.get(model, ())
+        objs = list(queryset.filter(user=user, pk__in=ids)) if ids else []
+        data[model] = _serializer_class(serializer_name)(
+            objs, many=True).data
+        missing[model] = set(ids) - {obj.pk for obj in objs}
+    return data, missing
+
+
+def snapshot(user):
+    """Return every row of the user and the cursor to sync from next"""
+    cursor = get_user_model().objects.filter(pk=user.pk) \
+        .values_list('change_seq', flat=True).get()
+    data = {}
+    for model, (queryset, serializer_name) in MODELS.items():
+        data[model] = _serializer_class(serializer_name)(
+            queryset.filter(user=user), many=True).data
+    data['deleted'] = {model: [] for model in MODELS}
+    return dict(data, cursor=cursor, more=False)
+
+
+def changes_since(user, since, limit):
+    """Return the rows changed after the cursor since, up to limit"""
+    entries = list(
+        ChangeLog.objects.filter(user=user, seq__gt=since)
+        .order_by('seq')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    changed = {model: [] for model in MODELS}
+    deleted = {model: set() for model in MODELS}
+    for entry in entries:
+        if entry.deleted:
+            deleted[entry.model].add(entry.object_id)
+        else:
+            changed[entry.model].append(entry.object_id)
+    data, missing = _serialize(user, changed)
+    data['deleted'] = {
+        model: sorted(deleted[model] | missing[model]) for model in MODELS
+    }
+    cursor = entries[-1].seq if entries else since
+    return dict(data, cursor=cursor, more=more)
@@ -0,0 +1,54 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from core.jobs import task
+from core.models import Recipe, release_recipe_image
+
+
+@task('recipe.process_image', queue='images')
+def process_image(recipe_id):
+    """Shrink the recipe image to fit RECIPE_IMAGE_MAX_SIZE"""
+    from PIL import Image
+
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return {'resized': False}
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    with recipe.image.open('rb') as f:
+        image = Image.open(f)
+        image_format = image.format
+        image.load()
+    if image.width <= max_size and image.height <= max_size:
+        return {'resized': False}
+
+    image.thumbnail((max_size, max_size))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    previous = recipe.image.name
+    recipe.image.save(os.path.basename(previous),
+                      ContentFile(buffer.getvalue()), save=False)
+    # Keep an image uploaded while this job was running
+    Recipe.objects.filter(pk=recipe_id, image=previous) \
+        .update(image=recipe.image.name)
+    release_recipe_image(previous)
+    return {'resized': True, 'image': recipe.image.name}
+
+
+@task('recipe.import_recipes')
+def import_recipes(user_id, recipes):
+    """Validate and create a list of recipes for a user"""
+    from recipe.serializers import RecipeSerialize
+
+    user = get_user_model().objects.get(pk=user_id)
+    serializer = RecipeSerialize(data=recipes, many=True,
+                                 context={'user': user})
+    if not serializer.is_valid():
+        return {'created': 0, 'errors': serializer.errors}
+    with transaction.atomic():
+        serializer.save(user=user)
+    return {'created': len(serializer.instance)}
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import QueryStats
+from core.tests.factories import create_user, create_recipe, create_tag, \
+    create_ingredient
+from recipe.filter_index import INDEXES
+
+
+FACETS_URL = reverse('recipe:recipe-facets')
+
+
+def counts(facets):
+    """Return the counts of the facets by name"""
+    return {facet['name']: facet['count'] for facet in facets}
+
+
+class FacetsApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        INDEXES.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = create_tag(self.user, name='Vegan')
+        self.quick = create_tag(self.user, name='Quick')
+        self.rice = create_ingredient(self.user, name='Rice')
+        create_recipe(self.user, tags=[self.vegan, self.quick])
+        create_recipe(self.user, tags=[self.vegan], ingredients=[self.rice])
+        other = create_user()
+        create_recipe(other, tags=[create_tag(other, name='Vegan')])
+
+    def test_facets_without_filters(self):
+        """Test every tag and ingredient of the user is counted"""
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(counts(res.data['tags']), {'Vegan': 2, 'Quick': 1})
+        self.assertEqual(counts(res.data['ingredients']), {'Rice': 1})
+
+    def test_facets_with_filters(self):
+        """Test the counts follow the active filters, zeros included"""
+        res = self.client.get(FACETS_URL, {'tags': self.quick.id})
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(counts(res.data['tags']), {'Vegan': 1, 'Quick': 1})
+        self.assertEqual(counts(res.data['ingredients']), {'Rice': 0})
+
+    def test_facets_of_tag_without_recipes(self):
+        """Test selecting a facet counted zero returns zero counts"""
+        unused = create_tag(self.user, name='Unused')
+
+        res = self.client.get(FACETS_URL, {'tags': unused.id})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['count'], 0)
+        self.assertEqual(counts(res.data['tags']),
+                         {'Vegan': 0, 'Quick': 0, 'Unused': 0})
+        self.assertEqual(counts(res.data['ingredients']), {'Rice': 0})
+
+    def test_facets_cached_per_price_filter(self):
+        """Test the cache keeps the counts of each price filter apart"""
+        create_recipe(self.user, price=20)
+
+        cheap = self.client.get(FACETS_URL, {'price_max': 10})
+        dear = self.client.get(FACETS_URL, {'price_max': 50})
+
+        self.assertEqual(cheap.data['count'], 2)
+        self.assertEqual(dear.data['count'], 3)
+
+    def test_facets_cached_until_change(self):
+        """Test repeated requests are cached and changes invalidate them"""
+        self.client.get(FACETS_URL)
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            self.client.get(FACETS_URL)
+        self.assertEqual(stats.count, 1)
+
+        create_recipe(self.user, tags=[self.quick])
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(counts(res.data['tags'])['Quick'], 2)
@@ -0,0 +1,88 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.tests.factories import create_user, create_recipe, create_tag, \
+    create_ingredient
+from recipe.filter_index import INDEXES, RecipeFilterIndexCache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeFilterIndexTests(TestCase):
+
+    def setUp(self):
+        INDEXES.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = create_tag(self.user, name='Vegan')
+        self.quick = create_tag(self.user, name='Quick')
+        self.rice = create_ingredient(self.user, name='Rice')
+        self.salad = create_recipe(self.user, tags=[self.vegan, self.quick])
+        self.curry = create_recipe(self.user, tags=[self.vegan],
+                                   ingredients=[self.rice])
+        self.steak = create_recipe(self.user, tags=[self.quick])
+
+    def ids(self, **params):
+        res = self.client.get(RECIPES_URL, params)
+        return {recipe['id'] for recipe in res.data}
+
+    def test_filter_any_and_all(self):
+        """Test tags match any by default and all with match=all"""
+        tags = f'{self.vegan.id},{self.quick.id}'
+
+        self.assertEqual(self.ids(tags=tags),
+                         {self.salad.id, self.curry.id, self.steak.id})
+        self.assertEqual(self.ids(tags=tags, match='all'), {self.salad.id})
+        self.assertEqual(
+            self.ids(tags=self.vegan.id, ingredients=self.rice.id),
+            {self.curry.id})
+
+    def test_index_matches_database(self):
+        """Test the index gives the same recipes as the SQL filters"""
+        queries = [
+            {'tags': f'{self.vegan.id},{self.quick.id}', 'match': 'all'},
+            {'tags': self.quick.id, 'ingredients': self.rice.id},
+            {'ingredients': self.rice.id},
+        ]
+        for params in queries:
+            with override_settings(RECIPE_FILTER_INDEX=False):
+                expected = self.ids(**params)
+            self.assertEqual(self.ids(**params), expected)
+
+    def test_index_follows_changes(self):
+        """Test link changes and deletes are seen by the next request"""
+        self.assertEqual(self.ids(ingredients=self.rice.id), {self.curry.id})
+
+        self.steak.ingredients.add(self.rice)
+        self.assertEqual(self.ids(ingredients=self.rice.id),
+                         {self.curry.id, self.steak.id})
+
+        self.client.delete(
+            reverse('recipe:recipe-detail', args=[self.curry.id]))
+        self.assertEqual(self.ids(ingredients=self.rice.id),
+                         {self.steak.id})
+
+    def test_index_cache_evicts_least_recently_used(self):
+        """Test the cache drops the oldest indexes over its size"""
+        cache = RecipeFilterIndexCache(max_size=7)
+        other = create_user()
+        create_recipe(other, tags=[create_tag(other), create_tag(other)])
+        new = create_user()
+
+        cache.get(self.user)
+        cache.get(other)
+        cache.get(self.user)
+        cache.get(new)
+        self.assertEqual(cache.size, 7)
+        self.assertEqual(list(cache._indexes),
+                         [other.pk, self.user.pk, new.pk])
+
+        self.steak.tags.add(self.vegan)
+        cache.get(self.user)
+
+        self.assertEqual(list(cache._indexes), [new.pk, self.user.pk])
+        self.assertEqual(cache.size, 6)
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -28,6 +29,7 @@ class PrivateIngredientsApiTests(TestCase):
     """Test the private ingredient api"""
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'test@mail.com',
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import QueryStats
+from core.tests.factories import create_user, create_recipe, \
+    create_ingredient
+
+
+MEAL_PLAN_URL = reverse('recipe:recipe-meal-plan')
+
+
+class MealPlanApiTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.eggs = create_ingredient(self.user, name='Eggs')
+        self.flour = create_ingredient(self.user, name='Flour')
+        self.milk = create_ingredient(self.user, name='Milk')
+        self.pancakes = create_recipe(
+            self.user, ingredients=[self.eggs, self.flour, self.milk],
+            price='4.00', time_minutes=20)
+        self.omelette = create_recipe(
+            self.user, ingredients=[self.eggs, self.milk],
+            price='2.50', time_minutes=10)
+
+    def test_meal_plan_totals_and_shopping_list(self):
+        """Test the plan is scaled by servings and merges ingredients"""
+        payload = {'recipes': [
+            {'id': self.pancakes.id, 'servings': 2},
+            {'id': self.omelette.id},
+        ]}
+
+        res = self.client.post(MEAL_PLAN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['total_price'], '10.50')
+        self.assertEqual(res.data['total_time_minutes'], 30)
+        self.assertEqual(res.data['ingredients'], [
+            {'id': self.eggs.id, 'name': 'Eggs', 'recipes': 2,
+             'servings': '3.00'},
+            {'id': self.flour.id, 'name': 'Flour', 'recipes': 1,
+             'servings': '2.00'},
+            {'id': self.milk.id, 'name': 'Milk', 'recipes': 2,
+             'servings': '3.00'},
+        ])
+
+    def test_meal_plan_query_count_constant(self):
+        """Test the plan is aggregated without a query per recipe"""
+        recipes = [create_recipe(self.user, ingredients=[self.eggs])
+                   for i in range(5)]
+        payload = {'recipes': [{'id': recipe.id} for recipe in recipes]}
+        stats = QueryStats()
+
+        with connection.execute_wrapper(stats):
+            res = self.client.post(MEAL_PLAN_URL, payload, format='json')
+
+        self.assertEqual(res.data['ingredients'][0]['recipes'], 5)
+        self.assertEqual(stats.count, 2)
+
+    def test_meal_plan_other_user_recipe(self):
+        """Test recipes of other users can not be planned"""
+        other = create_recipe(create_user())
+        payload = {'recipes': [{'id': self.pancakes.id}, {'id': other.id}]}
+
+        res = self.client.post(MEAL_PLAN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['recipes']), 1)
+
+    def test_meal_plan_invalid_servings(self):
+        """Test servings must be positive"""
+        payload = {'recipes': [{'id': self.pancakes.id, 'servings': 0}]}
+
+        res = self.client.post(MEAL_PLAN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MEAL_PLAN_MAX_RECIPES=2)
+    def test_meal_plan_too_many_recipes(self):
+        """Test the number of recipes of a plan is limited"""
+        payload = {'recipes': [{'id': self.pancakes.id}] * 3}
+
+        with self.assertNumQueries(0):
+            res = self.client.post(MEAL_PLAN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('no more than 2', res.data['recipes'][0])
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests.factories import create_recipe, create_user
+
+
+class RecipeImageServingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.image.save('photo.jpg', ContentFile(b'0123456789'))
+        self.url = self.recipe.image.url
+
+    def tearDown(self):
+        self.recipe.image.delete()
+
+    def test_owner_gets_image(self):
+        """Test that the owner gets the image with validators"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), b'0123456789')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_other_user_gets_not_found(self):
+        """Test that other users can not get the image"""
+        self.client.force_authenticate(create_user())
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_authentication_required(self):
+        """Test that anonymous requests are refused"""
+        res = APIClient().get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_matching_etag_not_modified(self):
+        """Test that a matching If-None-Match gets a 304"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_request(self):
+        """Test that a byte range gets a partial response"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(res.streaming_content), b'2345')
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/10')
+
+    def test_suffix_range_request(self):
+        """Test that a suffix byte range returns the end of the file"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+
+        self.assertEqual(b''.join(res.streaming_content), b'789')
+
+    def test_unsatisfiable_range(self):
+        """Test that a range past the end of the file gets a 416"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=20-30')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='x-accel-redirect')
+    def test_handoff_to_proxy(self):
+        """Test that the file is handed to the proxy when configured"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.recipe.image}')
+        self.assertEqual(res.content, b'')
+
+    def test_staff_gets_image(self):
+        """Test that staff can get the images of any user"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
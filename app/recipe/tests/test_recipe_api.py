@@ -4,7 +4,10 @@ import tempfile
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -15,6 +18,7 @@ from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerialize, RecipeDetailSerialize
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BATCH_URL = reverse('recipe:recipe-batch-update')
 
 
 def image_upload_url(recipe_id):
@@ -66,6 +70,7 @@ class PrivateRecipeApiTest(TestCase):
     """Test unauthenticated recipe API test"""
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'test@appdev.com',
@@ -206,6 +211,159 @@ class PrivateRecipeApiTest(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_partial_update_keeps_unchanged_links(self):
+        """Test that updating tags only touches the changed links"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        tag3 = sample_tag(user=self.user, name='Quick')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+        through = Recipe.tags.through
+        kept = through.objects.get(recipe=recipe, tag=tag2)
+
+        self.client.patch(
+            detail_url(recipe.id), {'tags': [tag2.id, tag3.id]})
+
+        self.assertEqual(set(recipe.tags.all()), {tag2, tag3})
+        self.assertTrue(through.objects.filter(id=kept.id).exists())
+
+    def test_create_recipe_with_other_user_tags(self):
+        """Test that tags of other users are rejected all together"""
+        other = get_user_model().objects.create_user(
+            'other@appdev.com',
+            'testpass'
+        )
+        own = sample_tag(user=self.user, name='Vegan')
+        foreign = sample_tag(user=other, name='Theirs')
+        payload = {
+            'title': 'Stolen tags',
+            'tags': [own.id, foreign.id, 9999],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn(str(foreign.id), res.data['tags'][0])
+        self.assertIn('9999', res.data['tags'][1])
+        self.assertFalse(Recipe.objects.filter(title='Stolen tags').exists())
+
+    def test_related_ids_resolved_in_one_query(self):
+        """Test that the submitted tags are fetched with one query"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(5)]
+        payload = {
+            'title': 'Tagged',
+            'tags': [tag.id for tag in tags],
+            'time_minutes': 5,
+            'price': 1.00
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(RECIPES_URL, payload)
+
+        tag_selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and
+            'FROM "core_tag" WHERE' in query['sql']
+        ]
+        self.assertEqual(len(tag_selects), 1)
+
+    def test_batch_update_recipes(self):
+        """Test updating many recipes with one bulk write per relation"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag1)
+        payload = [
+            {'id': recipe.id, 'title': f'Recipe {i}', 'tags': [tag2.id]}
+            for i, recipe in enumerate(recipes)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for i, recipe in enumerate(recipes):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.title, f'Recipe {i}')
+            self.assertEqual(list(recipe.tags.all()), [tag2])
+        statements = [query['sql'] for query in queries.captured_queries]
+        for verb in ('INSERT INTO "core_recipe_tags"',
+                     'DELETE FROM "core_recipe_tags"'):
+            self.assertEqual(
+                sum(sql.startswith(verb) for sql in statements), 1)
+
+    def test_batch_update_invalid_changes_nothing(self):
+        """Test that an invalid update in a batch rejects the whole batch"""
+        recipe1 = sample_recipe(user=self.user, title='First')
+        recipe2 = sample_recipe(user=self.user, title='Second')
+        payload = [
+            {'id': recipe1.id, 'title': 'Changed'},
+            {'id': recipe2.id, 'time_minutes': 'not a number'},
+        ]
+
+        res = self.client.patch(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe1.refresh_from_db()
+        self.assertEqual(recipe1.title, 'First')
+
+    @override_settings(RECIPE_BATCH_MAX=1)
+    def test_batch_update_limited(self):
+        """Test that a batch over the maximum is rejected"""
+        recipe1 = sample_recipe(user=self.user, title='First')
+        recipe2 = sample_recipe(user=self.user, title='Second')
+        payload = [{'id': recipe1.id, 'title': 'New'},
+                   {'id': recipe2.id, 'title': 'New'}]
+
+        res = self.client.patch(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe1.refresh_from_db()
+        self.assertEqual(recipe1.title, 'First')
+
+    def test_batch_update_bool_id_rejected(self):
+        """Test that true isn't taken as the id 1"""
+        recipe = sample_recipe(user=self.user, title='First')
+        Recipe.objects.filter(pk=recipe.pk).update(id=1)
+
+        res = self.client.patch(BATCH_URL, [{'id': True, 'title': 'New'}],
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.get(pk=1).title, 'First')
+
+    def test_batch_update_other_user_recipe(self):
+        """Test that recipes of other users can not be batch updated"""
+        other = get_user_model().objects.create_user(
+            'other@appdev.com',
+            'testpass'
+        )
+        recipe = sample_recipe(user=other, title='Theirs')
+
+        res = self.client.patch(
+            BATCH_URL, [{'id': recipe.id, 'title': 'Mine'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Theirs')
+
+    def test_delete_recipe_hides_it(self):
+        """Test deleted recipes are hidden at once and purged later"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        recipe.refresh_from_db()
+        self.assertIsNotNone(recipe.deleted_at)
+        self.assertEqual(self.client.get(RECIPES_URL).data, [])
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class RecipeImageUploadTests(TestCase):
 
@@ -286,3 +444,74 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serialize1.data, res.data)
         self.assertIn(serialize2.data, res.data)
         self.assertNotIn(serialize3.data, res.data)
+
+
+class RecipeRangeFilterTests(TestCase):
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@appdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.cheap = sample_recipe(
+            user=self.user, title='Toast', price=2.00, time_minutes=5)
+        self.middle = sample_recipe(
+            user=self.user, title='Curry', price=8.00, time_minutes=40)
+        self.pricey = sample_recipe(
+            user=self.user, title='Beef', price=20.00, time_minutes=90)
+
+    def titles(self, **params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_filter_price_and_time(self):
+        """Test filtering recipes by price range and maximum time"""
+        self.assertEqual(
+            self.titles(price_min='5', price_max='25', ordering='price'),
+            ['Curry', 'Beef'])
+        self.assertEqual(self.titles(time_max=40, ordering='-time'),
+                         ['Curry', 'Toast'])
+
+    def test_ordering(self):
+        """Test ordering by title, and by newest first by default"""
+        self.assertEqual(self.titles(ordering='title'),
+                         ['Beef', 'Curry', 'Toast'])
+        self.assertEqual(self.titles(), ['Beef', 'Curry', 'Toast'])
+
+    def test_range_with_tags(self):
+        """Test the range filters combine with the tag filter"""
+        tag = sample_tag(user=self.user)
+        self.cheap.tags.add(tag)
+        self.pricey.tags.add(tag)
+
+        self.assertEqual(self.titles(tags=tag.id, price_max='10'), ['Toast'])
+
+    def test_invalid_params(self):
+        """Test invalid filters are rejected"""
+        for params in ({'price_min': 'abc'}, {'time_max': -1},
+                       {'ordering': 'link'},
+                       {'price_min': '10', 'price_max': '5'}):
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_params_ignored_on_detail(self):
+        """Test the list filters don't apply to the other actions"""
+        url = detail_url(self.pricey.id)
+
+        res = self.client.patch(url + '?price_max=1&ordering=bogus',
+                                {'title': 'Steak'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Steak')
+
+    def test_range_filters_use_indexes(self):
+        """Test the price and time filters are served by their indexes"""
+        recipes = Recipe.objects.alive().filter(user=self.user)
+
+        plan = recipes.filter(price__lte=10).order_by('price').explain()
+        self.assertIn('recipe_user_price_idx', plan)
+        plan = recipes.filter(time_minutes__lte=30).explain()
+        self.assertIn('recipe_user_time_idx', plan)
@@ -0,0 +1,144 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeBucket, RecipeSignature
+from core.tests.factories import create_user, create_recipe, create_tag, \
+    create_ingredient
+from core.tests.utils import run_commit_hooks
+from recipe import similarity
+
+
+def similar_url(recipe_id):
+    """Return the similar recipes URL"""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+class SimilarityTests(TestCase):
+
+    def test_signatures_match_python_hashing(self):
+        """Test the vectorized signatures equal the Python ones"""
+        sets = [{1, 2, 3}, {5}, set(range(2, 40, 3))]
+
+        expected = [similarity.signature(values) for values in sets]
+        with patch.object(similarity, 'get_numpy', return_value=None):
+            self.assertEqual(similarity.signatures(sets), expected)
+        self.assertEqual(similarity.signatures(sets), expected)
+
+    def test_signature_estimates_jaccard(self):
+        """Test the share of equal minhashes follows the Jaccard index"""
+        first = similarity.signature(set(range(100)))
+        second = similarity.signature(set(range(50, 150)))
+
+        self.assertAlmostEqual(
+            similarity._similarity(first, second), 1 / 3, delta=0.15)
+
+    def test_build_recipe_index_command(self):
+        """Test the command indexes the recipes having links"""
+        user = create_user()
+        recipe = create_recipe(user, tags=[create_tag(user)])
+        create_recipe(user)
+        RecipeSignature.objects.all().delete()
+        RecipeBucket.objects.all().delete()
+
+        call_command('build_recipe_index', batch_size=1,
+                     stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(RecipeSignature.objects.get().recipe, recipe)
+        self.assertEqual(RecipeBucket.objects.count(), similarity.BANDS)
+
+
+class SimilarRecipesApiTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [create_tag(self.user, name=f'Tag {i}')
+                     for i in range(4)]
+        self.ingredients = [create_ingredient(self.user, name=f'Ing {i}')
+                            for i in range(4)]
+
+    def test_similar_recipes_ranked(self):
+        """Test recipes sharing tags and ingredients are returned first"""
+        recipe = create_recipe(self.user, tags=self.tags,
+                               ingredients=self.ingredients)
+        twin = create_recipe(self.user, tags=self.tags,
+                             ingredients=self.ingredients)
+        close = create_recipe(self.user, tags=self.tags,
+                              ingredients=self.ingredients[:3])
+        create_recipe(self.user, tags=[create_tag(self.user)])
+        run_commit_hooks()
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['recipe']['id'] for item in res.data],
+                         [twin.id, close.id])
+        self.assertEqual(res.data[0]['similarity'], 1.0)
+
+    def test_index_updated_on_link_changes(self):
+        """Test changing the links of a recipe updates its neighbours"""
+        recipe = create_recipe(self.user, tags=self.tags)
+        other = create_recipe(self.user, ingredients=self.ingredients)
+        run_commit_hooks()
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+        other.tags.set(self.tags)
+        other.ingredients.clear()
+        run_commit_hooks()
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual([item['recipe']['id'] for item in res.data],
+                         [other.id])
+
+    def test_links_indexed_once_per_transaction(self):
+        """Test the recipes changed in a transaction are indexed together"""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        run_commit_hooks()
+
+        with patch.object(similarity, 'index_recipes') as index_recipes:
+            for recipe in recipes:
+                recipe.tags.set(self.tags[:2])
+                recipe.ingredients.set(self.ingredients[:2])
+            run_commit_hooks()
+
+        index_recipes.assert_called_once()
+        self.assertEqual(
+            {recipe.id for recipe in index_recipes.call_args[0][0]},
+            {recipe.id for recipe in recipes}
+        )
+
+    def test_similar_excludes_other_users_and_deleted(self):
+        """Test only live recipes of the user are recommended"""
+        recipe = create_recipe(self.user, tags=self.tags)
+        deleted = create_recipe(self.user, tags=self.tags)
+        self.client.delete(reverse('recipe:recipe-detail', args=[deleted.id]))
+        other_user = create_user()
+        create_recipe(other_user, tags=self.tags)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.data, [])
+
+    def test_similar_skips_recipes_deleted_meanwhile(self):
+        """Test a recipe deleted after its signature was read is skipped"""
+        recipe = create_recipe(self.user, tags=self.tags)
+        deleted = create_recipe(self.user, tags=self.tags)
+        run_commit_hooks()
+        score = similarity._similarity
+
+        def delete_then_score(first, second):
+            Recipe.objects.filter(pk=deleted.pk).delete()
+            return score(first, second)
+
+        with patch.object(similarity, '_similarity', delete_then_score):
+            result = similarity.similar_recipes(recipe, limit=10)
+
+        self.assertEqual(result, [])
@@ -0,0 +1,127 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChangeLog
+from core.tests.factories import create_user, create_recipe, create_tag, \
+    create_ingredient
+
+
+SYNC_URL = reverse('recipe:sync')
+
+
+class SyncApiTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_auth_required(self):
+        """Test that authentication is required to sync"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_initial_sync_returns_everything(self):
+        """Test syncing without a cursor returns all the rows of the user"""
+        tag = create_tag(self.user)
+        recipe = create_recipe(self.user, tags=[tag])
+        create_recipe(create_user())
+
+        data = self.sync()
+
+        self.assertEqual([r['id'] for r in data['recipes']], [recipe.id])
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertGreater(data['cursor'], 0)
+        self.assertEqual(self.sync(data['cursor'])['recipes'], [])
+
+    def test_sync_returns_only_changes(self):
+        """Test only the rows changed since the cursor are returned"""
+        create_recipe(self.user, title='Unchanged')
+        changed = create_recipe(self.user, title='Changed')
+        cursor = self.sync()['cursor']
+
+        changed.title = 'Changed again'
+        changed.save()
+        ingredient = create_ingredient(self.user)
+        data = self.sync(cursor)
+
+        self.assertEqual([r['title'] for r in data['recipes']],
+                         ['Changed again'])
+        self.assertEqual([i['id'] for i in data['ingredients']],
+                         [ingredient.id])
+        self.assertFalse(data['more'])
+
+    def test_sync_returns_tombstones(self):
+        """Test deleted recipes are returned as tombstones"""
+        recipe = create_recipe(self.user)
+        cursor = self.sync()['cursor']
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+        data = self.sync(cursor)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted']['recipes'], [recipe.id])
+
+    def test_sync_links_change_recipe(self):
+        """Test changing the tags of a recipe returns the recipe"""
+        recipe = create_recipe(self.user)
+        tag = create_tag(self.user)
+        cursor = self.sync()['cursor']
+
+        recipe.tags.add(tag)
+        data = self.sync(cursor)
+
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+
+    def test_update_logged_once(self):
+        """Test saving a recipe with its links keeps one row in the log"""
+        recipe = create_recipe(self.user, tags=[create_tag(self.user)])
+        cursor = self.sync()['cursor']
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'title': 'Renamed', 'tags': [create_tag(self.user).id]}
+        )
+        data = self.sync(cursor)
+
+        self.assertEqual([r['title'] for r in data['recipes']], ['Renamed'])
+        self.assertEqual(
+            ChangeLog.objects.filter(model='recipes',
+                                     object_id=recipe.id).count(), 1)
+
+    def test_sync_paginated_by_sequence(self):
+        """Test the changes are paged in sequence order"""
+        cursor = self.sync()['cursor']
+        recipes = [create_recipe(self.user) for i in range(3)]
+
+        first = self.sync(cursor, limit=2)
+        second = self.sync(first['cursor'], limit=2)
+
+        self.assertTrue(first['more'])
+        self.assertFalse(second['more'])
+        self.assertEqual(
+            [r['id'] for r in first['recipes'] + second['recipes']],
+            [recipe.id for recipe in recipes]
+        )
+
+    def test_sync_limited_to_user(self):
+        """Test changes of other users are not returned"""
+        cursor = self.sync()['cursor']
+        create_recipe(create_user())
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['cursor'], cursor)
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
 from django.test import TestCase
 
 from rest_framework import status
@@ -28,6 +30,7 @@ class PrivateTagsApiTests(TestCase):
     """Test the authorized user tags API"""
 
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             'test@user.com',
             'password123'
@@ -97,6 +100,22 @@ class PrivateTagsApiTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertNotIn(serializer2.data, res.data)
 
+    def test_assigned_only_ignores_deleted_recipes(self):
+        """Test tags only used by deleted recipes are not assigned"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=10,
+            price=5.00,
+            user=self.user,
+            deleted_at=timezone.now()
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.data, [])
+
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -1,19 +1,49 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import Http404, HttpResponseRedirect
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
-from core.models import Tag, Ingredient, Recipe
+from core import jobs
+from core.coalescing import CoalescedReadMixin
+from core.compression import CachedResponseMixin
+from core.media import send_file
+from core.storage import is_content_addressed
+from core.models import Tag, Ingredient, Recipe, recipe_image_file_path
+from core.metrics import ViewTimingMixin
+from core.serializers import JobSerializer
 from recipe import serializers
+from recipe.facets import cached_facet_counts
+from recipe.filter_index import INDEXES, current_version
+from recipe.meal_plan import build_meal_plan
+from recipe.similarity import similar_recipes
+from recipe.sync import changes_since, snapshot
+from user.authentication import SignedTokenAuthentication
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(CachedResponseMixin,
+                            CoalescedReadMixin,
+                            ViewTimingMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    cached_actions = ('list',)
+
+    def get_cache_version(self):
+        return current_version(self.request.user)
 
     def get_queryset(self):
         """Return object for the current auth user"""
@@ -22,7 +52,8 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe__isnull=False,
+                                       recipe__deleted_at__isnull=True)
 
         return queryset.filter(
             user=self.request.user).order_by('-name').distinct()
@@ -44,12 +75,17 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, CoalescedReadMixin,
+                    ViewTimingMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerialize
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    cached_actions = ('retrieve',)
+
+    def get_cache_version(self):
+        return current_version(self.request.user)
 
     def _params_to_ints(self, qs):
         """Convert a list of stings IDs to a list of integers"""
@@ -59,15 +95,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self.request.query_params.get('match') == 'all'
         queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        tag_ids = self._params_to_ints(tags) if tags else []
+        ingredient_ids = \
+            self._params_to_ints(ingredients) if ingredients else []
+        if (tag_ids or ingredient_ids) and settings.RECIPE_FILTER_INDEX:
+            index = INDEXES.get(self.request.user)
+            queryset = queryset.filter(
+                pk__in=index.filter(tag_ids, ingredient_ids, match_all))
+        else:
+            for field, ids in (('tags', tag_ids),
+                               ('ingredients', ingredient_ids)):
+                if ids and match_all:
+                    for pk in ids:
+                        queryset = queryset.filter(**{f'{field}__id': pk})
+                elif ids:
+                    queryset = queryset.filter(**{f'{field}__id__in': ids})
+
+        # The other actions work on the recipes named by the request
+        if self.action in ('list', 'facets'):
+            queryset = self._filter_range(queryset)
+        return queryset.alive().filter(user=self.request.user)
 
-        return queryset.filter(user=self.request.user)
+    def _filter_range(self, queryset):
+        """Apply the price and time filters and the ordering"""
+        params = serializers.RecipeFilterSerializer(
+            data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        if 'price_min' in filters:
+            queryset = queryset.filter(price__gte=filters['price_min'])
+        if 'price_max' in filters:
+            queryset = queryset.filter(price__lte=filters['price_max'])
+        if 'time_max' in filters:
+            queryset = queryset.filter(time_minutes__lte=filters['time_max'])
+
+        return queryset.order_by(filters.get('ordering', '-id'))
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -75,6 +139,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerialize
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'image_upload_url':
+            return serializers.RecipeImageUploadUrlSerializer
+        elif self.action == 'image_upload_complete':
+            return serializers.RecipeImageUploadCompleteSerializer
+        elif self.action == 'meal_plan':
+            return serializers.MealPlanSerializer
 
         return self.serializer_class
 
@@ -82,6 +152,122 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        """Hide the recipe, the purge command deletes it later"""
+        instance.deleted_at = timezone.now()
+        instance.save(update_fields=['deleted_at'])
+
+    @action(methods=['PATCH'], detail=False, url_path='batch')
+    def batch_update(self, request):
+        """Partially update many recipes in a single transaction"""
+        if not isinstance(request.data, list) or \
+                len(request.data) > settings.RECIPE_BATCH_MAX or \
+                not all(isinstance(item, dict) for item in request.data):
+            return Response(
+                {'detail': 'Expected a list of at most '
+                           f'{settings.RECIPE_BATCH_MAX} recipe updates.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = [item.get('id') for item in request.data]
+        # JSON true and false are ints to Python, not ids
+        recipes = self.get_queryset().in_bulk([
+            pk for pk in ids
+            if isinstance(pk, int) and not isinstance(pk, bool)
+        ])
+        if len(recipes) != len(ids) or len(set(ids)) != len(ids):
+            return Response(
+                {'detail': 'Every update needs the id of a different recipe '
+                           'of the user.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids],
+            data=request.data,
+            many=True,
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        """Queue the creation of many recipes"""
+        if not isinstance(request.data, list) or \
+                len(request.data) > settings.RECIPE_IMPORT_MAX:
+            return Response(
+                {'detail': 'Expected a list of at most '
+                           f'{settings.RECIPE_IMPORT_MAX} recipes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job = jobs.enqueue('recipe.import_recipes', user=request.user,
+                           user_id=request.user.id, recipes=request.data)
+
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('job-detail', args=[job.id])}
+        )
+
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        """Count the recipes of each tag and ingredient under the filters"""
+        # The ordering doesn't change the counts, the other filters do
+        params = {
+            key: request.query_params[key]
+            for key in ('tags', 'ingredients', 'match', 'price_min',
+                        'price_max', 'time_max')
+            if key in request.query_params
+        }
+
+        return Response(
+            cached_facet_counts(request.user, self.get_queryset, params),
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=False, url_path='meal-plan')
+    def meal_plan(self, request):
+        """Combine recipes into a shopping list with the plan totals"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        servings_by_id = serializer.validated_data['recipes']
+
+        plan = build_meal_plan(self.get_queryset(), servings_by_id)
+        if plan['recipes'] != len(servings_by_id):
+            found = set(self.get_queryset().filter(
+                pk__in=list(servings_by_id)).values_list('id', flat=True))
+            return Response(
+                {'recipes': [
+                    f'Invalid pk "{pk}" - object does not exist.'
+                    for pk in servings_by_id if pk not in found
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(plan, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Return the recipes of the user most similar to this one"""
+        recipe = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, settings.SIMILAR_RECIPES_MAX))
+        similar = [
+            {'recipe': other, 'similarity': score}
+            for other, score in similar_recipes(recipe, limit)
+        ]
+
+        return Response(
+            serializers.SimilarRecipeSerializer(similar, many=True).data,
+            status=status.HTTP_200_OK
+        )
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image toa a recipe"""
@@ -93,8 +279,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
+            job = jobs.enqueue('recipe.process_image', user=request.user,
+                               recipe_id=recipe.id)
             return Response(
-                serializer.data,
+                dict(serializer.data, job=job.id),
                 status=status.HTTP_200_OK
             )
 
@@ -102,3 +290,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='image-upload-url')
+    def image_upload_url(self, request, pk=None):
+        """Presign an upload of the image straight to the storage"""
+        recipe = self.get_object()
+        if not hasattr(default_storage, 'presigned_upload'):
+            return Response(
+                {'detail': 'The storage does not support direct uploads.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        name, url, headers = default_storage.presigned_upload(
+            recipe_image_file_path(
+                recipe, f'image.{serializer.validated_data["extension"]}'),
+            serializer.validated_data['sha256']
+        )
+        return Response(
+            {'image': name, 'url': url, 'method': 'PUT', 'headers': headers},
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=True, url_path='image-upload-complete')
+    def image_upload_complete(self, request, pk=None):
+        """Attach an image uploaded straight to the storage"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(recipe, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(
+            serializers.RecipeImageSerializer(
+                recipe, context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK
+        )
+
+
+class SyncView(APIView):
+    """Return the recipes, tags and ingredients changed since a cursor"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return a snapshot without since, the changes after it with"""
+        if 'since' not in request.query_params:
+            return Response(snapshot(request.user))
+        try:
+            since = int(request.query_params['since'])
+            limit = int(request.query_params.get(
+                'limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'detail': 'since and limit must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+        return Response(changes_since(request.user, since, limit))
+
+
+def _owns_image(user, name):
+    """Return whether one of the user's recipes has the image, cached"""
+    key = f'media_owner:{user.pk}:' + hashlib.md5(name.encode()).hexdigest()
+    if cache.get(key):
+        return True
+    owned = Recipe.objects.alive().filter(image=name, user=user).exists()
+    if owned:
+        cache.set(key, True, settings.MEDIA_OWNER_CACHE_TIMEOUT)
+    return owned
+
+
+class RecipeImageView(APIView):
+    """Serve recipe images to their owner"""
+    authentication_classes = (SignedTokenAuthentication,
+                              SessionAuthentication)
+    permission_classes = (IsAuthenticated,)
+
+    def perform_content_negotiation(self, request, force=False):
+        """Serve images whatever the Accept header asks for"""
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, path):
+        if request.user.is_staff:
+            if not Recipe.objects.filter(image=path).exists():
+                raise Http404
+        elif not _owns_image(request.user, path):
+            raise Http404
+        try:
+            default_storage.path(path)
+        except NotImplementedError:
+            return HttpResponseRedirect(default_storage.url(path))
+        if is_content_addressed(path):
+            return send_file(
+                request, path,
+                cache_control='private, max-age=31536000, immutable'
+            )
+        return send_file(request, path)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from user.tokens import InvalidToken, read_token
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """Authenticate with the signed tokens issued by CreateTokenView
+
+    The signature, expiry and revocation are checked in memory, only the
+    user is loaded from the database. Keys of the previous database tokens
+    are still accepted while AUTH_LEGACY_TOKENS is enabled.
+    """
+
+    def authenticate_credentials(self, key):
+        try:
+            payload = read_token(key)
+        except InvalidToken as exc:
+            if settings.AUTH_LEGACY_TOKENS and ':' not in key:
+                return super().authenticate_credentials(key)
+            raise exceptions.AuthenticationFailed(exc.args[0])
+
+        try:
+            user = get_user_model().objects.get(pk=payload['u'])
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+
+        return (user, payload)
@@ -0,0 +1,131 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode()).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value):
+        return all(self._bits[position // 8] & (1 << (position % 8))
+                   for position in self._positions(value))
+
+
+class RevocationIndex:
+    """In-memory copy of the RevokedToken table
+
+    Lookups only touch memory: a Bloom filter rules out almost every token,
+    the exact set confirms the rest. At most once per
+    AUTH_REVOCATION_SYNC_INTERVAL seconds one request pulls the rows created
+    since the previous sync, going back AUTH_REVOCATION_SYNC_OVERLAP seconds
+    more for the rows committed late, while the others keep using the index
+    as it is. Expired tokens are dropped, and the Bloom filter rebuilt once
+    it holds more tokens than AUTH_REVOCATION_CAPACITY.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._revoked = {}
+        self._rebuild_bloom()
+        self._last_sync = None
+        self._synced_at = None
+
+    def _rebuild_bloom(self):
+        bloom = BloomFilter(settings.AUTH_REVOCATION_CAPACITY,
+                            settings.AUTH_REVOCATION_ERROR_RATE)
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._bloom_count = len(self._revoked)
+
+    def _add(self, jti, expires_at):
+        self._bloom.add(jti)
+        self._bloom_count += 1
+        self._revoked[jti] = expires_at
+
+    def add(self, jti, expires_at):
+        """Revoke a token in this process without waiting for a sync"""
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def _is_due(self):
+        synced_at = self._synced_at
+        return synced_at is None or time.monotonic() - synced_at >= \
+            settings.AUTH_REVOCATION_SYNC_INTERVAL
+
+    def sync(self):
+        """Pull the tokens revoked since the last sync"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        now = timezone.now()
+        rows = RevokedToken.objects.filter(expires_at__gt=now)
+        if self._last_sync is not None:
+            since = self._last_sync - timezone.timedelta(
+                seconds=settings.AUTH_REVOCATION_SYNC_OVERLAP)
+            # Rows revoked before created_at was added have none
+            rows = rows.filter(Q(created_at__gte=since) |
+                               Q(created_at__isnull=True))
+        for jti, expires_at in rows.values_list('jti', 'expires_at'):
+            if jti not in self._revoked:
+                self._add(jti, expires_at.timestamp())
+
+        timestamp = now.timestamp()
+        for jti in [jti for jti, expires_at in self._revoked.items()
+                    if expires_at <= timestamp]:
+            del self._revoked[jti]
+        if self._bloom_count > settings.AUTH_REVOCATION_CAPACITY:
+            self._rebuild_bloom()
+        self._last_sync = now
+        self._synced_at = time.monotonic()
+
+    def is_revoked(self, jti):
+        if self._is_due():
+            if self._synced_at is None:
+                # Nothing to answer from before the first sync
+                with self._lock:
+                    if self._is_due():
+                        self._sync()
+            elif self._lock.acquire(blocking=False):
+                try:
+                    if self._is_due():
+                        self._sync()
+                finally:
+                    self._lock.release()
+        if jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+REVOCATIONS = RevocationIndex()
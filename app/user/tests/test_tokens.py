@@ -0,0 +1,156 @@
+import time
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import RevokedToken
+from user.revocation import REVOCATIONS, BloomFilter
+from user.tokens import issue_token, read_token
+
+
+TOKEN_URL = reverse('user:token')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+
+
+class SignedTokenTests(TestCase):
+    """Test the signed, expiring and revocable auth tokens"""
+
+    def setUp(self):
+        cache.clear()
+        REVOCATIONS.clear()
+        self.user = get_user_model().objects.create_user(
+            'token@example.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    def authenticate(self, key):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_login_token_authenticates(self):
+        """Test that the token returned by login authenticates requests"""
+        resp = self.client.post(
+            TOKEN_URL,
+            {'email': 'token@example.com', 'password': 'testpass'}
+        )
+        self.authenticate(resp.data['token'])
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['email'], self.user.email)
+
+    def test_token_checked_without_token_queries(self):
+        """Test that validating a token only loads the user"""
+        self.authenticate(issue_token(self.user))
+        REVOCATIONS.sync()
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_tampered_token_rejected(self):
+        """Test that a token with an altered signature is rejected"""
+        self.authenticate(issue_token(self.user) + 'x')
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_TTL=-1)
+    def test_expired_token_rejected(self):
+        """Test that a token past its expiry is rejected"""
+        self.authenticate(issue_token(self.user))
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_token_rejected(self):
+        """Test that a revoked token no longer authenticates"""
+        key = issue_token(self.user)
+        jti = read_token(key)['j']
+        self.authenticate(key)
+
+        resp = self.client.post(REVOKE_URL)
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(RevokedToken.objects.filter(jti=jti).exists())
+
+        resp = self.client.get(ME_URL)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_REVOCATION_SYNC_INTERVAL=0)
+    def test_revocation_synced_from_table(self):
+        """Test that revocations made by other processes are picked up"""
+        key = issue_token(self.user)
+        jti = read_token(key)['j']
+        RevokedToken.objects.create(
+            jti=jti,
+            expires_at=timezone.now() + timezone.timedelta(days=1)
+        )
+        self.authenticate(key)
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_committed_late_synced(self):
+        """Test that a row created before the last sync is picked up"""
+        REVOCATIONS.sync()
+        token = RevokedToken.objects.create(
+            jti='late', expires_at=timezone.now() + timezone.timedelta(days=1))
+        RevokedToken.objects.filter(pk=token.pk).update(
+            created_at=timezone.now() - timezone.timedelta(seconds=30))
+
+        REVOCATIONS.sync()
+
+        self.assertTrue(REVOCATIONS.is_revoked('late'))
+
+    def test_expired_revocations_dropped(self):
+        """Test that a sync forgets the tokens past their expiry"""
+        REVOCATIONS.add('expired', time.time() - 1)
+
+        REVOCATIONS.sync()
+
+        self.assertFalse(REVOCATIONS.is_revoked('expired'))
+
+    @override_settings(AUTH_REVOCATION_SYNC_INTERVAL=0)
+    def test_lookup_not_waiting_for_sync(self):
+        """Test that lookups use the index as is while another syncs"""
+        REVOCATIONS.sync()
+        REVOCATIONS.add('revoked', time.time() + 60)
+
+        with REVOCATIONS._lock, self.assertNumQueries(0):
+            self.assertTrue(REVOCATIONS.is_revoked('revoked'))
+
+    def test_legacy_token_accepted(self):
+        """Test that the tokens stored in the database still work"""
+        token = Token.objects.create(user=self.user)
+        self.authenticate(token.key)
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+
+class BloomFilterTests(TestCase):
+
+    def test_no_false_negatives(self):
+        """Test that every added value is reported as present"""
+        bloom = BloomFilter(capacity=100, error_rate=0.01)
+        values = [f'jti-{i}' for i in range(100)]
+        for value in values:
+            bloom.add(value)
+
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
@@ -1,10 +1,15 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.throttling import LoginEmailRateThrottle
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -19,6 +24,7 @@ class PublicUserApiTests(TestCase):
     """Test the users api public"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -139,3 +145,67 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertAlmostEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_delete_user_deactivates(self):
+        """Test deleting the profile deactivates the user at once"""
+        resp = self.client.delete(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+
+
+class LoginThroughputTests(TestCase):
+    """Test the cost controls of the token endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.payload = {'email': 'login@example.com', 'password': 'testpass'}
+        self.user = create_user(**self.payload)
+
+    def test_login_issues_token_without_token_queries(self):
+        """Test that issuing a token only needs the user lookup"""
+        with self.assertNumQueries(1):
+            first = self.client.post(TOKEN_URL, self.payload)
+        second = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(first.data['token'], second.data['token'])
+
+    @patch.object(LoginEmailRateThrottle, 'rate', '2/min', create=True)
+    def test_login_flood_rejected_before_hashing(self):
+        """Test that throttled logins never reach authentication"""
+        payload = dict(self.payload, password='wrong')
+        self.client.post(TOKEN_URL, payload)
+        self.client.post(TOKEN_URL, payload)
+
+        with patch('user.serializers.authenticate') as authenticate:
+            resp = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        authenticate.assert_not_called()
+
+    def test_login_with_email_not_a_string(self):
+        """Test that a JSON email of another type is a bad request"""
+        resp = self.client.post(TOKEN_URL, {'email': 5, 'password': 'x'},
+                                format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        PASSWORD_HASHERS=['core.hashers.PBKDF2PasswordHasher'],
+        PASSWORD_PBKDF2_ITERATIONS=1000
+    )
+    def test_password_rehashed_on_login(self):
+        """Test that changing the work factor rehashes on the next login"""
+        self.user.set_password(self.payload['password'])
+        self.user.save()
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            resp = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
@@ -0,0 +1,38 @@
+import hashlib
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SettingsRateThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle reading its rate from the current settings
+
+    SimpleRateThrottle keeps the rates found when it is imported, so
+    override_settings wouldn't change them.
+    """
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+
+
+class LoginRateThrottle(SettingsRateThrottle):
+    """Limit the login attempts coming from a single address"""
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class LoginEmailRateThrottle(SettingsRateThrottle):
+    """Limit the login attempts made for a single email"""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not email or not isinstance(email, str):
+            return None
+        ident = hashlib.sha1(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,51 @@
+import secrets
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from core.models import RevokedToken
+from user.revocation import REVOCATIONS
+
+
+SALT = 'user.tokens'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def issue_token(user):
+    """Return a new signed token for the user"""
+    payload = {
+        'u': user.pk,
+        'j': secrets.token_hex(8),
+        'e': int(time.time()) + settings.AUTH_TOKEN_TTL,
+    }
+    return signing.dumps(payload, salt=SALT)
+
+
+def read_token(key):
+    """Return the payload of a valid token, without touching the database"""
+    try:
+        payload = signing.loads(key, salt=SALT)
+    except signing.BadSignature:
+        raise InvalidToken(_('Invalid token.'))
+    if payload['e'] <= time.time():
+        raise InvalidToken(_('Token has expired.'))
+    if REVOCATIONS.is_revoked(payload['j']):
+        raise InvalidToken(_('Token has been revoked.'))
+    return payload
+
+
+def revoke_token(payload):
+    """Revoke a token until its expiry"""
+    expires_at = datetime.fromtimestamp(payload['e'], timezone.utc)
+    RevokedToken.objects.get_or_create(
+        jti=payload['j'],
+        defaults={'expires_at': expires_at}
+    )
+    REVOCATIONS.add(payload['j'], payload['e'])
@@ -1,10 +1,17 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.metrics import ViewTimingMixin
+from user.authentication import SignedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import LoginRateThrottle, LoginEmailRateThrottle
+from user.tokens import issue_token, revoke_token
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ViewTimingMixin, generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
 
@@ -13,14 +20,40 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginRateThrottle, LoginEmailRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """Authenticate the user and return a new signed token"""
+        serializer = self.serializer_class(data=request.data,
+                                           context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response({'token': issue_token(user)})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class RevokeTokenView(APIView):
+    """Revoke the token used to authenticate the request."""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        if isinstance(request.auth, dict):
+            revoke_token(request.auth)
+        else:
+            request.auth.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(ViewTimingMixin, generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return the authenticated user"""
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Deactivate the user, the purge command deletes it later"""
+        instance.soft_delete()